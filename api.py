@@ -10,6 +10,7 @@ from flask_cors import CORS
 
 from blueprints import Services, init_services, register_blueprints
 from core import config, configure_logging
+from core.json_provider import OrjsonProvider
 from core.middleware import (
     add_security_headers,
     check_and_handle_session_timeout,
@@ -56,6 +57,9 @@ if static_folder:
 else:
     app = Flask(__name__)
 
+# Serialize API responses with orjson (see core.json_provider for output differences)
+app.json = OrjsonProvider(app)
+
 # Enable debug mode for local development (disables HTTPS redirect)
 app.debug = os.environ.get("FLASK_DEBUG", "0") == "1"
 
@@ -1,7 +1,16 @@
+import functools
 import os
 import sys
 
+if getattr(sys, "frozen", False):
+    # Running as PyInstaller bundle - version.txt is in _internal/
+    _VERSION_FILE = os.path.join(os.path.dirname(sys.executable), "_internal", "version.txt")
+else:
+    # Running as script - version.txt is in project root
+    _VERSION_FILE = os.path.join(os.path.dirname(__file__), "version.txt")
 
+
+@functools.lru_cache(maxsize=1)
 def get_version() -> str:
     """
     Get the application version.
@@ -10,6 +19,8 @@ def get_version() -> str:
     1. APP_VERSION env var (for Docker/custom deployments)
     2. Bundled version.txt (baked in during PyInstaller build)
     3. Fallback to "0.0.0"
+
+    The result is cached; the version can't change during a process lifetime.
     """
     # Priority 1: Environment variable override
     env_version = os.environ.get("APP_VERSION")
@@ -18,18 +29,9 @@ def get_version() -> str:
 
     # Priority 2: Read from bundled version.txt
     try:
-        if getattr(sys, "frozen", False):
-            # Running as PyInstaller bundle - version.txt is in _internal/
-            bundle_dir = os.path.dirname(sys.executable)
-            version_file = os.path.join(bundle_dir, "_internal", "version.txt")
-        else:
-            # Running as script - version.txt is in project root
-            version_file = os.path.join(os.path.dirname(__file__), "version.txt")
-
-        if os.path.exists(version_file):
-            with open(version_file) as f:
-                return f.read().strip()
-    except Exception:
+        with open(_VERSION_FILE, "rb") as f:
+            return f.read().strip().decode("ascii")
+    except (OSError, UnicodeDecodeError):
         pass
 
     return "0.0.0"
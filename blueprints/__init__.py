@@ -4,7 +4,7 @@
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-from flask import Flask, g
+from flask import Flask, current_app, has_app_context
 
 if TYPE_CHECKING:
     from services.security_service import SecurityService
@@ -16,7 +16,7 @@ if TYPE_CHECKING:
 class Services:
     """Container for shared service instances.
 
-    Injected into Flask's g context on each request via init_services().
+    Registered once on app.extensions via init_services().
     Access within route handlers using get_services().
     """
 
@@ -26,19 +26,21 @@ class Services:
 
 
 def get_services() -> Services:
-    """Get services from request context.
+    """Get services from the current app.
 
     Only call within route handlers, never at import time.
     Raises RuntimeError if called outside request context.
     """
-    services: Services | None = getattr(g, "services", None)
+    services: Services | None = (
+        current_app.extensions.get("services") if has_app_context() else None
+    )
     if services is None:
         raise RuntimeError("Services not initialized. Call only within request context.")
     return services
 
 
 def init_services(app: Flask, services: Services | None = None) -> Services:
-    """Initialize service instances and inject into request context.
+    """Initialize service instances and register them on the app.
 
     Call once during app setup, before registering blueprints.
 
@@ -60,9 +62,9 @@ def init_services(app: Flask, services: Services | None = None) -> Services:
             notes_manager=NotesStateManager(),
         )
 
-    @app.before_request
-    def inject_services():
-        g.services = services
+    # Services are process-wide, so store them once rather than re-injecting
+    # into g on every request.
+    app.extensions["services"] = services
 
     return services
 
@@ -1,11 +1,11 @@
 # Notes blueprint
 # /notes/* endpoints for monthly notes feature
 
-import re
+from typing import TypeGuard
 
-from flask import Blueprint, request, session
+from flask import Blueprint, g, request, session
 
-from core import api_handler, sanitize_id, sanitize_name
+from core import api_handler, config, sanitize_id, sanitize_name
 from core.exceptions import ValidationError
 
 from . import get_services
@@ -13,32 +13,64 @@ from . import get_services
 notes_bp = Blueprint("notes", __name__, url_prefix="/notes")
 
 # Constants for validation
-MONTH_KEY_PATTERN = r"^\d{4}-\d{2}$"
 ERR_INVALID_MONTH_KEY = "Invalid month_key format. Expected YYYY-MM."
 ERR_INVALID_VIEWING_MONTH = "Invalid viewing_month. Expected YYYY-MM."
 ERR_INVALID_CATEGORY_TYPE = "Invalid category_type. Must be 'group' or 'category'."
 ERR_INVALID_NOTE_ID = "Invalid note_id."
 ERR_INVALID_CATEGORY_ID = "Invalid category_id."
 
+# Deployment-time constant; resolved once instead of on every request
+_IS_DESKTOP = config.is_desktop_environment()
+
+
+def _valid_month_key(value: object) -> TypeGuard[str]:
+    """Check that value is a YYYY-MM month key.
+
+    The format is fixed-length, so a character check is cheaper than running
+    a regex on every request.
+    """
+    return (
+        isinstance(value, str)
+        and len(value) == 7
+        and value[4] == "-"
+        and value[:4].isdecimal()
+        and value[5:].isdecimal()
+    )
+
+
+def _require_id(value: str | None, error: str) -> str:
+    """Sanitize an ID, raising ValidationError with the given message if invalid."""
+    safe_id = sanitize_id(value)
+    if not safe_id:
+        raise ValidationError(error)
+    return safe_id
+
 
 def _get_passphrase() -> str:
     """Get passphrase from session or header. Raises if not available.
 
     In desktop mode, cookies don't work reliably between file:// and http://localhost,
     so we also accept the notes key via X-Notes-Key header.
+
+    The result is cached on flask.g for the rest of the request.
     """
-    from core import config
+    cached: str | None = getattr(g, "_notes_passphrase", None)
+    if cached is not None:
+        return cached
+
+    passphrase: str | None = None
 
     # First try the header (desktop mode workaround for cookie issues)
-    if config.is_desktop_environment():
-        header_key = request.headers.get("X-Notes-Key")
-        if header_key:
-            return header_key
+    if _IS_DESKTOP:
+        passphrase = request.headers.get("X-Notes-Key") or None
 
     # Fall back to session (web mode)
-    passphrase: str | None = session.get("session_passphrase")
+    if not passphrase:
+        passphrase = session.get("session_passphrase")
     if not passphrase:
         raise ValidationError("Session expired. Please unlock again.")
+
+    g._notes_passphrase = passphrase
     return passphrase
 
 
@@ -51,12 +83,11 @@ def get_month_notes(month_key: str):
     Returns notes, general month note, and metadata.
     """
     # Validate month_key format (YYYY-MM)
-    if not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError(ERR_INVALID_MONTH_KEY)
 
-    services = get_services()
     passphrase = _get_passphrase()
-    return services.notes_manager.get_all_notes_for_month(month_key, passphrase)
+    return get_services().notes_manager.get_all_notes_for_month(month_key, passphrase)
 
 
 @notes_bp.route("/all", methods=["GET"])
@@ -69,9 +100,8 @@ def get_all_notes():
     effective notes for any month instantly without additional API calls.
     This enables immediate page navigation in the notes feature.
     """
-    services = get_services()
     passphrase = _get_passphrase()
-    return services.notes_manager.get_all_notes(passphrase)
+    return get_services().notes_manager.get_all_notes(passphrase)
 
 
 @notes_bp.route("/categories", methods=["GET"])
@@ -83,8 +113,7 @@ async def get_notes_categories():
     Returns all category groups with their categories, not filtered by
     recurring expenses or any other criteria.
     """
-    services = get_services()
-    return await services.sync_service.get_all_categories_grouped()
+    return await get_services().sync_service.get_all_categories_grouped()
 
 
 @notes_bp.route("/category", methods=["POST"])
@@ -108,12 +137,11 @@ def save_category_note():
     if not category_id or not category_name:
         raise ValidationError("Missing category_id or category_name.")
 
-    if not month_key or not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError(ERR_INVALID_MONTH_KEY)
 
-    services = get_services()
     passphrase = _get_passphrase()
-    note = services.notes_manager.save_note(
+    note = get_services().notes_manager.save_note(
         passphrase=passphrase,
         category_type=category_type,
         category_id=category_id,
@@ -134,13 +162,9 @@ def save_category_note():
 @api_handler(handle_mfa=False)
 def delete_category_note(note_id: str):
     """Delete a category note by ID."""
-    safe_note_id = sanitize_id(note_id)
-    if not safe_note_id:
-        raise ValidationError(ERR_INVALID_NOTE_ID)
-    note_id = safe_note_id
+    note_id = _require_id(note_id, ERR_INVALID_NOTE_ID)
 
-    services = get_services()
-    deleted = services.notes_manager.delete_note(note_id)
+    deleted = get_services().notes_manager.delete_note(note_id)
     return {"success": deleted}
 
 
@@ -148,12 +172,11 @@ def delete_category_note(note_id: str):
 @api_handler(handle_mfa=False)
 def get_general_note(month_key: str):
     """Get general note for a specific month."""
-    if not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError(ERR_INVALID_MONTH_KEY)
 
-    services = get_services()
     passphrase = _get_passphrase()
-    note = services.notes_manager.get_general_note(month_key, passphrase)
+    note = get_services().notes_manager.get_general_note(month_key, passphrase)
     return {"note": note}
 
 
@@ -166,12 +189,11 @@ def save_general_note():
     month_key = data.get("month_key")
     content = data.get("content", "")
 
-    if not month_key or not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError(ERR_INVALID_MONTH_KEY)
 
-    services = get_services()
     passphrase = _get_passphrase()
-    note = services.notes_manager.save_general_note(month_key, content, passphrase)
+    note = get_services().notes_manager.save_general_note(month_key, content, passphrase)
     return {
         "success": True,
         "note": note,
@@ -182,11 +204,10 @@ def save_general_note():
 @api_handler(handle_mfa=False)
 def delete_general_note(month_key: str):
     """Delete general note for a month."""
-    if not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError(ERR_INVALID_MONTH_KEY)
 
-    services = get_services()
-    deleted = services.notes_manager.delete_general_note(month_key)
+    deleted = get_services().notes_manager.delete_general_note(month_key)
     return {"success": deleted}
 
 
@@ -194,9 +215,8 @@ def delete_general_note(month_key: str):
 @api_handler(handle_mfa=False)
 def get_archived_notes():
     """Get all archived notes."""
-    services = get_services()
     passphrase = _get_passphrase()
-    archived = services.notes_manager.get_archived_notes(passphrase)
+    archived = get_services().notes_manager.get_archived_notes(passphrase)
     return {"archived_notes": archived}
 
 
@@ -204,13 +224,9 @@ def get_archived_notes():
 @api_handler(handle_mfa=False)
 def delete_archived_note(note_id: str):
     """Permanently delete an archived note."""
-    safe_note_id = sanitize_id(note_id)
-    if not safe_note_id:
-        raise ValidationError(ERR_INVALID_NOTE_ID)
-    note_id = safe_note_id
+    note_id = _require_id(note_id, ERR_INVALID_NOTE_ID)
 
-    services = get_services()
-    deleted = services.notes_manager.delete_archived_note(note_id)
+    deleted = get_services().notes_manager.delete_archived_note(note_id)
     return {"success": deleted}
 
 
@@ -222,25 +238,17 @@ async def sync_notes_categories():
 
     Detects deleted categories and archives their notes.
     """
-    services = get_services()
     passphrase = _get_passphrase()
 
     # Get current categories from Monarch (with nested categories)
-    groups = await services.sync_service.get_all_categories_grouped()
+    groups = await get_services().sync_service.get_all_categories_grouped()
 
     # Extract all category IDs (both groups and categories)
-    current_ids: set[str] = set()
-    for group in groups:
-        group_id = group.get("id")
-        if group_id:
-            current_ids.add(group_id)
-        # Add category IDs from this group
-        for cat in group.get("categories", []):
-            cat_id = cat.get("id")
-            if cat_id:
-                current_ids.add(cat_id)
-
-    result = services.notes_manager.sync_categories(current_ids, passphrase)
+    current_ids: set[str] = {group["id"] for group in groups if group.get("id")} | {
+        cat["id"] for group in groups for cat in group.get("categories", ()) if cat.get("id")
+    }
+
+    result = get_services().notes_manager.sync_categories(current_ids, passphrase)
     return {"success": True, **result}
 
 
@@ -251,14 +259,12 @@ def get_note_history(category_type: str, category_id: str):
     if category_type not in ("group", "category"):
         raise ValidationError(ERR_INVALID_CATEGORY_TYPE)
 
-    safe_category_id = sanitize_id(category_id)
-    if not safe_category_id:
-        raise ValidationError(ERR_INVALID_CATEGORY_ID)
-    category_id = safe_category_id
+    category_id = _require_id(category_id, ERR_INVALID_CATEGORY_ID)
 
-    services = get_services()
     passphrase = _get_passphrase()
-    history = services.notes_manager.get_revision_history(category_type, category_id, passphrase)
+    history = get_services().notes_manager.get_revision_history(
+        category_type, category_id, passphrase
+    )
     return {"history": history}
 
 
@@ -271,17 +277,14 @@ def get_note_history(category_type: str, category_id: str):
 @api_handler(handle_mfa=False)
 def get_checkbox_states(note_id: str):
     """Get checkbox states for a category/group note."""
-    safe_note_id = sanitize_id(note_id)
-    if not safe_note_id:
-        raise ValidationError(ERR_INVALID_NOTE_ID)
+    note_id = _require_id(note_id, ERR_INVALID_NOTE_ID)
 
     viewing_month = request.args.get("viewing_month")
-    if not viewing_month or not re.match(MONTH_KEY_PATTERN, viewing_month):
+    if not _valid_month_key(viewing_month):
         raise ValidationError(ERR_INVALID_VIEWING_MONTH)
 
-    services = get_services()
     _get_passphrase()  # Verify session is valid
-    states = services.notes_manager.get_checkbox_states(safe_note_id, viewing_month)
+    states = get_services().notes_manager.get_checkbox_states(note_id, viewing_month)
     return {"states": states}
 
 
@@ -289,16 +292,15 @@ def get_checkbox_states(note_id: str):
 @api_handler(handle_mfa=False)
 def get_general_checkbox_states(source_month: str):
     """Get checkbox states for a general note."""
-    if not re.match(MONTH_KEY_PATTERN, source_month):
+    if not _valid_month_key(source_month):
         raise ValidationError("Invalid source_month. Expected YYYY-MM.")
 
     viewing_month = request.args.get("viewing_month")
-    if not viewing_month or not re.match(MONTH_KEY_PATTERN, viewing_month):
+    if not _valid_month_key(viewing_month):
         raise ValidationError(ERR_INVALID_VIEWING_MONTH)
 
-    services = get_services()
     _get_passphrase()  # Verify session is valid
-    states = services.notes_manager.get_general_checkbox_states(source_month, viewing_month)
+    states = get_services().notes_manager.get_general_checkbox_states(source_month, viewing_month)
     return {"states": states}
 
 
@@ -315,7 +317,7 @@ def update_checkbox_state():
     is_checked = data.get("is_checked")
 
     # Validate inputs
-    if not viewing_month or not re.match(MONTH_KEY_PATTERN, viewing_month):
+    if not _valid_month_key(viewing_month):
         raise ValidationError(ERR_INVALID_VIEWING_MONTH)
 
     if checkbox_index is None or not isinstance(checkbox_index, int) or checkbox_index < 0:
@@ -331,17 +333,13 @@ def update_checkbox_state():
         raise ValidationError("Provide only one of note_id or general_note_month_key.")
 
     if note_id:
-        safe_note_id = sanitize_id(note_id)
-        if not safe_note_id:
-            raise ValidationError(ERR_INVALID_NOTE_ID)
-        note_id = safe_note_id
+        note_id = _require_id(note_id, ERR_INVALID_NOTE_ID)
 
-    if general_note_month_key and not re.match(MONTH_KEY_PATTERN, general_note_month_key):
+    if general_note_month_key and not _valid_month_key(general_note_month_key):
         raise ValidationError("Invalid general_note_month_key. Expected YYYY-MM.")
 
-    services = get_services()
     _get_passphrase()  # Verify session is valid
-    states = services.notes_manager.update_checkbox_state(
+    states = get_services().notes_manager.update_checkbox_state(
         viewing_month=viewing_month,
         checkbox_index=checkbox_index,
         is_checked=is_checked,
@@ -355,12 +353,11 @@ def update_checkbox_state():
 @api_handler(handle_mfa=False)
 def get_month_checkbox_states(viewing_month: str):
     """Get all checkbox states for a viewing month (for export)."""
-    if not re.match(MONTH_KEY_PATTERN, viewing_month):
+    if not _valid_month_key(viewing_month):
         raise ValidationError(ERR_INVALID_VIEWING_MONTH)
 
-    services = get_services()
     _get_passphrase()  # Verify session is valid
-    states = services.notes_manager.get_all_checkbox_states_for_month(viewing_month)
+    states = get_services().notes_manager.get_all_checkbox_states_for_month(viewing_month)
     return {"states": states}
 
 
@@ -382,24 +379,21 @@ def get_inheritance_impact():
     month_key = request.args.get("month_key")
     is_general = request.args.get("is_general", "false").lower() == "true"
 
-    if not month_key or not re.match(MONTH_KEY_PATTERN, month_key):
+    if not _valid_month_key(month_key):
         raise ValidationError("Invalid month_key. Expected YYYY-MM.")
 
-    services = get_services()
     passphrase = _get_passphrase()
 
     if is_general:
-        impact = services.notes_manager.get_general_inheritance_impact(month_key, passphrase)
+        impact = get_services().notes_manager.get_general_inheritance_impact(month_key, passphrase)
     else:
         if not category_type or category_type not in ("group", "category"):
             raise ValidationError(ERR_INVALID_CATEGORY_TYPE)
 
-        safe_category_id = sanitize_id(category_id)
-        if not safe_category_id:
-            raise ValidationError(ERR_INVALID_CATEGORY_ID)
+        category_id = _require_id(category_id, ERR_INVALID_CATEGORY_ID)
 
-        impact = services.notes_manager.get_inheritance_impact(
-            category_type, safe_category_id, month_key, passphrase
+        impact = get_services().notes_manager.get_inheritance_impact(
+            category_type, category_id, month_key, passphrase
         )
 
     return impact
@@ -11,6 +11,9 @@ import html
 import re
 from typing import Any
 
+# IDs: alphanumeric, hyphens, underscores (used with fullmatch, so no anchors)
+_ID_PATTERN = re.compile(r"[\w-]+")
+
 
 def sanitize_string(value: str | None, max_length: int = 500) -> str:
     """
@@ -157,7 +160,7 @@ def sanitize_id(value: str | None) -> str | None:
     value = str(value)
 
     # Only allow alphanumeric, hyphens, underscores
-    if not re.match(r"^[\w-]+$", value):
+    if not _ID_PATTERN.fullmatch(value):
         return None
 
     # Reasonable max length for IDs
@@ -1,23 +1,30 @@
 """
 Background scheduler for automated sync tasks.
 
-Always-on scheduler that runs two jobs while the app is running:
-- Full sync: every 60 minutes (includes IFTTT event checks)
-- IFTTT sync: every 15 minutes (lightweight, skips if full sync ran recently)
+Always-on scheduler that runs a single 15-minute tick while the app is running.
+Each tick runs one of:
+- Full sync: once every 60 minutes (includes IFTTT event checks)
+- IFTTT sync: otherwise (lightweight, skips if full sync ran recently)
 
 Uses active session credentials — no automation credentials or user consent needed.
 """
 
 import asyncio
 import logging
+import threading
+import time
 from collections.abc import Callable
-from datetime import UTC, datetime
-from typing import Optional
+from concurrent.futures import CancelledError
+from typing import TYPE_CHECKING, Any, Optional
 
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
+if TYPE_CHECKING:
+    from services.credentials_service import CredentialsService
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,39 +33,66 @@ class SyncScheduler:
     Always-on background scheduler for sync tasks.
 
     Singleton pattern ensures only one scheduler instance exists.
-    Jobs are executed in background threads via APScheduler.
+    Jobs are executed in background threads via APScheduler, which hand the
+    async callbacks to a long-lived event loop running on its own thread.
+
+    One job ticks every 15 minutes and picks the work for that tick:
+    - Full sync when 60 minutes have passed since the last scheduled full sync
+    - IFTTT event check otherwise (skips if full sync ran within 15 min)
 
-    Two jobs run automatically:
-    - Full sync every 60 minutes
-    - IFTTT event check every 15 minutes (skips if full sync ran within 15 min)
+    After repeated full sync failures the tick interval doubles per failure
+    (capped at a day) and returns to 15 minutes after the next success.
     """
 
     _instance: Optional["SyncScheduler"] = None
     _scheduler: BackgroundScheduler | None = None
+    # Epoch seconds of the last completed sync; None until known
+    _last_sync_epoch: float | None = None
 
-    FULL_SYNC_JOB_ID = "full_sync"
-    IFTTT_SYNC_JOB_ID = "ifttt_sync"
+    SYNC_JOB_ID = "sync"
     FULL_SYNC_INTERVAL_MINUTES = 60
     IFTTT_SYNC_INTERVAL_MINUTES = 15
+    # Allowance for tick jitter so the 4th tick isn't pushed to the 5th
+    _TICK_GRACE_SECONDS = 60
+    # One job with max_instances=1 never needs more than one worker thread
+    _EXECUTOR_MAX_WORKERS = 1
+    _MISFIRE_GRACE_SECONDS = 300
+    # Upper bound on a single callback so a hung sync can't pin the worker
+    _CALLBACK_TIMEOUT_SECONDS = 30 * 60
+    _SHUTDOWN_TIMEOUT_SECONDS = 5
+    # Widen the tick after repeated full sync failures, up to once a day
+    _BACKOFF_AFTER_FAILURES = 2
+    _MAX_BACKOFF_MINUTES = 1440
 
     @classmethod
     def get_instance(cls) -> "SyncScheduler":
         """Get or create the singleton scheduler instance."""
+        return cls()
+
+    def __new__(cls) -> "SyncScheduler":
+        """Return the singleton, creating it on first construction."""
         if cls._instance is None:
-            cls._instance = cls()
+            cls._instance = super().__new__(cls)
         return cls._instance
 
     def __init__(self):
-        """Initialize the scheduler (use get_instance() instead)."""
-        if SyncScheduler._instance is not None:
-            raise RuntimeError("Use SyncScheduler.get_instance() instead")
+        """Initialize the scheduler once; later constructions are no-ops."""
+        if self.__dict__.get("_initialized"):
+            return
 
-        self._scheduler = BackgroundScheduler(
-            jobstores={"default": MemoryJobStore()}, timezone="UTC"
-        )
+        self._initialized = True
+        # Created on start() so processes that never start it pay nothing
+        self._scheduler = None
         self._full_sync_callback: Callable | None = None
         self._ifttt_sync_callback: Callable | None = None
         self._is_started = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._last_full_sync_monotonic = 0.0
+        self._consecutive_failures = 0
+        self._tick_minutes = self.IFTTT_SYNC_INTERVAL_MINUTES
+        # Resolved on first use; importing at module level would be circular
+        self._credentials_service: type[CredentialsService] | None = None
 
     def set_full_sync_callback(self, callback: Callable) -> None:
         """Set the async function to call for full sync."""
@@ -69,33 +103,35 @@ class SyncScheduler:
         self._ifttt_sync_callback = callback
 
     def start(self) -> None:
-        """Start the scheduler and register both jobs."""
-        if self._is_started or self._scheduler is None:
+        """Start the scheduler and register the sync job."""
+        if self._is_started:
             return
 
+        self._scheduler = BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(max_workers=self._EXECUTOR_MAX_WORKERS)},
+            jobstores={"default": MemoryJobStore()},
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": self._MISFIRE_GRACE_SECONDS,
+            },
+            timezone="UTC",
+        )
+        self._start_loop()
         self._scheduler.start()
         self._is_started = True
+        self._consecutive_failures = 0
+        self._tick_minutes = self.IFTTT_SYNC_INTERVAL_MINUTES
+        # First full sync is due one full interval after startup
+        self._last_full_sync_monotonic = time.monotonic()
 
-        # Register full sync job (60 min)
-        self._scheduler.add_job(
-            self._run_full_sync_wrapper,
-            trigger=IntervalTrigger(minutes=self.FULL_SYNC_INTERVAL_MINUTES),
-            id=self.FULL_SYNC_JOB_ID,
-            name="Full Monarch Sync",
-            replace_existing=True,
-            max_instances=1,
-            coalesce=True,
-        )
-
-        # Register IFTTT sync job (15 min)
+        # Single tick decides between full sync and IFTTT check (15 min)
         self._scheduler.add_job(
-            self._run_ifttt_sync_wrapper,
+            self._run_sync_tick,
             trigger=IntervalTrigger(minutes=self.IFTTT_SYNC_INTERVAL_MINUTES),
-            id=self.IFTTT_SYNC_JOB_ID,
-            name="IFTTT Event Check",
+            id=self.SYNC_JOB_ID,
+            name="Monarch Sync",
             replace_existing=True,
-            max_instances=1,
-            coalesce=True,
         )
 
         logger.info(
@@ -105,24 +141,144 @@ class SyncScheduler:
         )
 
     def shutdown(self) -> None:
-        """Gracefully shutdown the scheduler."""
+        """
+        Gracefully shutdown the scheduler.
+
+        Cancels any callback still running on the event loop so the job
+        waiting on it returns, then waits for the job before stopping the loop.
+        """
         if self._is_started and self._scheduler is not None:
-            self._scheduler.shutdown(wait=False)
+            scheduler = self._scheduler
+            self._scheduler = None
+            scheduler.pause()
+            self._cancel_loop_tasks()
+            scheduler.shutdown(wait=True)
+            self._stop_loop()
             self._is_started = False
             logger.info("Background scheduler shutdown")
 
+    def _start_loop(self) -> None:
+        """Start the event loop thread that runs the async sync callbacks."""
+        if self._loop is not None:
+            return
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=self._run_loop, args=(loop,), name="sync-scheduler-loop", daemon=True
+        )
+        self._loop = loop
+        self._loop_thread = thread
+        thread.start()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def _cancel_loop_tasks(self) -> None:
+        """Cancel the callbacks running on the event loop and wait for them to unwind."""
+        loop = self._loop
+        if loop is None:
+            return
+
+        async def cancel_all() -> None:
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(
+                timeout=self._SHUTDOWN_TIMEOUT_SECONDS
+            )
+        except TimeoutError:
+            logger.warning("Timed out cancelling scheduled sync tasks")
+
+    def _stop_loop(self) -> None:
+        """Stop the event loop thread and wait briefly for it to exit."""
+        loop, thread = self._loop, self._loop_thread
+        self._loop = None
+        self._loop_thread = None
+        if loop is None:
+            return
+
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=self._SHUTDOWN_TIMEOUT_SECONDS)
+
+    def _run_callback(self, callback: Callable) -> Any:
+        """Run an async callback on the scheduler's event loop and return its result."""
+        loop = self._loop
+        if loop is None:
+            raise RuntimeError("Scheduler event loop is not running")
+        future = asyncio.run_coroutine_threadsafe(callback(), loop)
+        try:
+            return future.result(timeout=self._CALLBACK_TIMEOUT_SECONDS)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    @classmethod
+    def record_sync_complete(cls) -> None:
+        """Record that a sync just completed, so IFTTT ticks can skip disk reads."""
+        cls._last_sync_epoch = time.time()
+
+    def _get_last_sync_epoch(self) -> float | None:
+        """Get the last sync time, loading it from state only if not yet known."""
+        if SyncScheduler._last_sync_epoch is None:
+            from state import StateManager
+
+            SyncScheduler._last_sync_epoch = StateManager().get_last_sync_epoch()
+        return SyncScheduler._last_sync_epoch
+
     def _has_session_credentials(self) -> bool:
         """Check if active session credentials are available."""
-        from services.credentials_service import CredentialsService
-
-        return CredentialsService._session_credentials is not None
+        credentials_service = self._credentials_service
+        if credentials_service is None:
+            from services.credentials_service import CredentialsService
+
+            credentials_service = self._credentials_service = CredentialsService
+        return credentials_service._session_credentials is not None
+
+    def _run_sync_tick(self) -> None:
+        """Run a full sync if one is due, otherwise the lightweight IFTTT check."""
+        elapsed = time.monotonic() - self._last_full_sync_monotonic
+        if elapsed >= self.FULL_SYNC_INTERVAL_MINUTES * 60 - self._TICK_GRACE_SECONDS:
+            self._last_full_sync_monotonic = time.monotonic()
+            self._run_full_sync_wrapper()
+        else:
+            self._run_ifttt_sync_wrapper()
+
+    def _reschedule_tick(self, minutes: int) -> None:
+        """Change the sync job's interval if it differs from the current one."""
+        if minutes == self._tick_minutes or self._scheduler is None:
+            return
+        self._tick_minutes = minutes
+        self._scheduler.reschedule_job(self.SYNC_JOB_ID, trigger=IntervalTrigger(minutes=minutes))
+        logger.info("Sync tick interval set to %d min", minutes)
+
+    def _record_full_sync_failure(self) -> None:
+        """Back off the tick interval once full syncs keep failing."""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self._BACKOFF_AFTER_FAILURES:
+            minutes = self.FULL_SYNC_INTERVAL_MINUTES * 2 ** (self._consecutive_failures - 1)
+            self._reschedule_tick(min(minutes, self._MAX_BACKOFF_MINUTES))
+
+    def _record_full_sync_success(self) -> None:
+        """Restore the normal tick interval after a successful full sync."""
+        self._consecutive_failures = 0
+        self._reschedule_tick(self.IFTTT_SYNC_INTERVAL_MINUTES)
 
     def _run_full_sync_wrapper(self) -> None:
         """
-        Run full sync in a new event loop.
+        Run full sync on the scheduler's event loop.
 
-        APScheduler runs jobs in threads, so we create
-        a new event loop for the async callback.
+        APScheduler runs jobs in threads, so the async callback is submitted
+        to the long-lived loop and this worker thread waits for the result.
+        A callback that returns False is counted as a failed sync.
         Skips silently if no active session credentials.
         """
         if self._full_sync_callback is None:
@@ -134,19 +290,23 @@ class SyncScheduler:
 
         try:
             logger.info("Starting scheduled full sync")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(self._full_sync_callback())
-                logger.info("Scheduled full sync completed")
-            finally:
-                loop.close()
+            succeeded = self._run_callback(self._full_sync_callback) is not False
+        except CancelledError:
+            logger.info("Scheduled full sync cancelled")
+            return
         except Exception as e:
             logger.error(f"Scheduled full sync failed: {e}")
+            succeeded = False
+
+        if succeeded:
+            logger.info("Scheduled full sync completed")
+            self._record_full_sync_success()
+        else:
+            self._record_full_sync_failure()
 
     def _run_ifttt_sync_wrapper(self) -> None:
         """
-        Run IFTTT event check in a new event loop.
+        Run IFTTT event check on the scheduler's event loop.
 
         Skips if:
         - No active session credentials
@@ -161,13 +321,9 @@ class SyncScheduler:
 
         # Skip if full sync ran within the last 15 minutes
         try:
-            from state import StateManager
-
-            state = StateManager().load()
-            if state.last_sync:
-                last_sync_str = state.last_sync.replace("Z", "+00:00")
-                last_sync_time = datetime.fromisoformat(last_sync_str)
-                elapsed = (datetime.now(UTC) - last_sync_time).total_seconds()
+            last_sync_epoch = self._get_last_sync_epoch()
+            if last_sync_epoch is not None:
+                elapsed = time.time() - last_sync_epoch
                 if elapsed < self.IFTTT_SYNC_INTERVAL_MINUTES * 60:
                     logger.debug(
                         "Skipping IFTTT sync — full sync ran %d seconds ago",
@@ -180,12 +336,9 @@ class SyncScheduler:
 
         try:
             logger.info("Starting scheduled IFTTT event check")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(self._ifttt_sync_callback())
-                logger.info("Scheduled IFTTT event check completed")
-            finally:
-                loop.close()
+            self._run_callback(self._ifttt_sync_callback)
+            logger.info("Scheduled IFTTT event check completed")
+        except CancelledError:
+            logger.info("Scheduled IFTTT event check cancelled")
         except Exception as e:
             logger.error(f"Scheduled IFTTT event check failed: {e}")
@@ -103,6 +103,7 @@ a = Analysis(
         'dotenv',
         'pyotp',
         'cachetools',
+        'orjson',
         'certifi',
         'dateutil',
         'dateutil.relativedelta',
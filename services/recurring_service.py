@@ -67,7 +67,7 @@ class Frequency(Enum):
         }[self]
 
 
-@dataclass
+@dataclass(slots=True)
 class RecurringItem:
     """Represents a recurring transaction from Monarch."""
 
@@ -6,12 +6,17 @@ Handles saved views (tag-filtered tabs), transaction fetching, refund matching,
 and tag replacement.
 """
 
+import asyncio
+import functools
 import html
-import json
 import logging
 import re
+import time
+from collections.abc import Callable, Coroutine
 from datetime import datetime
-from typing import Any
+from typing import Any, Concatenate, ParamSpec, TypeVar
+
+import orjson
 
 from monarch_utils import (
     get_mm,
@@ -22,23 +27,94 @@ from monarch_utils import (
     set_transaction_tags,
     update_transaction_notes,
 )
+from services.credentials_service import CredentialsService
 from state.db import db_session
 from state.db.repositories import TrackerRepository
 
 logger = logging.getLogger(__name__)
 
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# Parsed (tag_ids, category_ids) per saved view, keyed on (id, updated_at) so
+# any edit to a view misses the cache. Cleared wholesale if it ever fills up.
+_VIEW_FILTER_CACHE: dict[tuple[str, Any], tuple[list[str], list[str] | None]] = {}
+_VIEW_FILTER_CACHE_MAX = 256
+
+
+def _drops_mm_on_error(
+    method: Callable[Concatenate["RefundsService", P], Coroutine[Any, Any, T]],
+) -> Callable[Concatenate["RefundsService", P], Coroutine[Any, Any, T]]:
+    """Drop the cached Monarch client if a Monarch-backed method fails.
+
+    An expired token or dropped session then costs one failed request
+    rather than every request until the cache expires. Best-effort writes
+    that swallow their errors drop the client themselves.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self: "RefundsService", *args: P.args, **kwargs: P.kwargs) -> T:
+        try:
+            return await method(self, *args, **kwargs)
+        except Exception:
+            self._drop_mm()
+            raise
+
+    return wrapper
+
 
 class RefundsService:
     """Service for refunds feature operations."""
 
+    # Config is read far more often than it changes; settings imports write it
+    # directly, so cached reads are only trusted for a few seconds.
+    CONFIG_CACHE_TTL_SECONDS = 5.0
+    # get_mm() logs in and validates the session with an API call each time,
+    # so the client is reused for a while within one unlocked session.
+    MONARCH_CLIENT_TTL_SECONDS = 300.0
+
+    def __init__(self) -> None:
+        self._config_cache: tuple[float, dict[str, Any]] | None = None
+        self._mm_cache: tuple[float, object, Any] | None = None
+
+    # === Monarch client ===
+
+    async def _get_mm(self) -> Any:
+        """Get an authenticated Monarch client, reusing a recent one for the same session.
+
+        Only cached while session credentials are unlocked; logging out or in
+        again replaces the credentials object and so invalidates the cache.
+        """
+        credentials = CredentialsService._session_credentials
+        cached = self._mm_cache
+        if (
+            cached is not None
+            and credentials is not None
+            and cached[1] is credentials
+            and time.monotonic() - cached[0] < self.MONARCH_CLIENT_TTL_SECONDS
+        ):
+            return cached[2]
+
+        mm = await get_mm()
+        self._mm_cache = (time.monotonic(), credentials, mm) if credentials is not None else None
+        return mm
+
+    def _drop_mm(self) -> None:
+        """Forget the cached Monarch client so the next call re-authenticates."""
+        self._mm_cache = None
+
     # === Config ===
 
     async def get_config(self) -> dict[str, Any]:
         """Get refunds configuration."""
+        cached = self._config_cache
+        if cached is not None and time.monotonic() - cached[0] < self.CONFIG_CACHE_TTL_SECONDS:
+            return dict(cached[1])
+
         with db_session() as session:
             repo = TrackerRepository(session)
             config = repo.get_refunds_config()
-            return {
+            result = {
                 "replacementTagId": config.replacement_tag_id,
                 "replaceTagByDefault": config.replace_tag_by_default,
                 "agingWarningDays": config.aging_warning_days,
@@ -46,9 +122,12 @@ class RefundsService:
                 "hideMatchedTransactions": config.hide_matched_transactions,
                 "hideExpectedTransactions": config.hide_expected_transactions,
             }
+        self._config_cache = (time.monotonic(), result)
+        return dict(result)
 
     async def update_config(self, updates: dict[str, Any]) -> dict[str, Any]:
         """Update refunds configuration."""
+        self._config_cache = None
         with db_session() as session:
             repo = TrackerRepository(session)
             # Map camelCase to snake_case
@@ -70,6 +149,7 @@ class RefundsService:
 
     # === Pending Count ===
 
+    @_drops_mm_on_error
     async def get_pending_count(self) -> dict[str, Any]:
         """Get count of unmatched transactions across all saved views.
 
@@ -87,47 +167,48 @@ class RefundsService:
             view_filters = _parse_view_filters(views)
             all_tag_ids: set[str] = set()
             all_cat_ids: set[str] = set()
-            for _, tag_ids, cat_ids, _ in view_filters:
-                all_tag_ids.update(tag_ids)
-                if cat_ids:
-                    all_cat_ids.update(cat_ids)
+            for _, tag_set, cat_set, _ in view_filters:
+                all_tag_ids.update(tag_set)
+                if cat_set:
+                    all_cat_ids.update(cat_set)
 
             if not all_tag_ids and not all_cat_ids:
                 return {"count": 0, "viewCounts": {}}
 
-            matched_ids = {m.original_transaction_id for m in repo.get_refunds_matches()}
+            matched_ids = repo.get_matched_original_ids()
 
         # Fetch transactions from Monarch. Tags and categories are ANDed
         # by the API, so fetch separately and merge to get the full union.
-        mm = await get_mm()
-        seen_ids: set[str] = set()
-        all_transactions: list[dict[str, Any]] = []
-
+        # The two fetches are independent, so run them concurrently.
+        mm = await self._get_mm()
+        fetches = []
         if all_tag_ids:
-            tagged = await get_transactions_with_icons(mm, tag_ids=list(all_tag_ids))
-            for t in tagged:
-                seen_ids.add(t["id"])
-            all_transactions.extend(tagged)
-
+            fetches.append(get_transactions_with_icons(mm, tag_ids=list(all_tag_ids)))
         if all_cat_ids:
-            by_cat = await get_transactions_with_icons(mm, category_ids=list(all_cat_ids))
-            for t in by_cat:
-                if t["id"] not in seen_ids:
-                    seen_ids.add(t["id"])
-                    all_transactions.append(t)
-
-        # Only count expenses (negative amount), matching the UI tally logic
-        unmatched_expenses = [
-            t for t in all_transactions if t.get("amount", 0) < 0 and t["id"] not in matched_ids
-        ]
+            fetches.append(get_transactions_with_icons(mm, category_ids=list(all_cat_ids)))
+
+        # Filter while merging: matched IDs start out as "seen" so they're
+        # skipped along with duplicates, and only expenses (negative amount)
+        # are kept, matching the UI tally logic.
+        seen_ids = matched_ids
+        unmatched_expenses: list[dict[str, Any]] = []
+        for batch in await asyncio.gather(*fetches):
+            for t in batch:
+                txn_id = t["id"]
+                if txn_id in seen_ids:
+                    continue
+                seen_ids.add(txn_id)
+                if t.get("amount", 0) < 0:
+                    unmatched_expenses.append(t)
 
         return _compute_view_counts(view_filters, unmatched_expenses)
 
     # === Tags ===
 
+    @_drops_mm_on_error
     async def get_tags(self) -> list[dict[str, Any]]:
         """Get all Monarch transaction tags."""
-        mm = await get_mm()
+        mm = await self._get_mm()
         tags = await get_transaction_tags(mm)
         return tags
 
@@ -138,17 +219,20 @@ class RefundsService:
         with db_session() as session:
             repo = TrackerRepository(session)
             views = repo.get_refunds_views()
-            return [
-                {
-                    "id": v.id,
-                    "name": v.name,
-                    "tagIds": json.loads(v.tag_ids),
-                    "categoryIds": json.loads(v.category_ids) if v.category_ids else None,
-                    "sortOrder": v.sort_order,
-                    "excludeFromAll": v.exclude_from_all,
-                }
-                for v in views
-            ]
+            result = []
+            for v in views:
+                tag_ids, category_ids = _load_view_filter(v)
+                result.append(
+                    {
+                        "id": v.id,
+                        "name": v.name,
+                        "tagIds": list(tag_ids),
+                        "categoryIds": list(category_ids) if category_ids is not None else None,
+                        "sortOrder": v.sort_order,
+                        "excludeFromAll": v.exclude_from_all,
+                    }
+                )
+            return result
 
     async def create_view(
         self,
@@ -162,8 +246,8 @@ class RefundsService:
             repo = TrackerRepository(session)
             view = repo.create_refunds_view(
                 name=name,
-                tag_ids=json.dumps(tag_ids),
-                category_ids=json.dumps(category_ids) if category_ids else None,
+                tag_ids=_json_dumps(tag_ids),
+                category_ids=_json_dumps(category_ids) if category_ids else None,
                 exclude_from_all=exclude_from_all,
             )
             return {
@@ -183,10 +267,10 @@ class RefundsService:
             if "name" in updates:
                 kwargs["name"] = updates["name"]
             if "tagIds" in updates:
-                kwargs["tag_ids"] = json.dumps(updates["tagIds"])
+                kwargs["tag_ids"] = _json_dumps(updates["tagIds"])
             if "categoryIds" in updates:
                 cat_ids = updates["categoryIds"]
-                kwargs["category_ids"] = json.dumps(cat_ids) if cat_ids else None
+                kwargs["category_ids"] = _json_dumps(cat_ids) if cat_ids else None
             if "sortOrder" in updates:
                 kwargs["sort_order"] = updates["sortOrder"]
             if "excludeFromAll" in updates:
@@ -213,6 +297,7 @@ class RefundsService:
 
     # === Transactions ===
 
+    @_drops_mm_on_error
     async def get_transactions(
         self,
         tag_ids: list[str] | None = None,
@@ -221,7 +306,7 @@ class RefundsService:
         end_date: str | None = None,
     ) -> list[dict[str, Any]]:
         """Fetch transactions filtered by tags, categories, and date range."""
-        mm = await get_mm()
+        mm = await self._get_mm()
         transactions = await get_transactions_with_icons(
             mm,
             tag_ids=tag_ids,
@@ -231,6 +316,7 @@ class RefundsService:
         )
         return transactions
 
+    @_drops_mm_on_error
     async def search_for_refund(
         self,
         search: str | None = None,
@@ -244,7 +330,7 @@ class RefundsService:
         Returns dict with 'transactions' (list) and 'nextCursor' (int or None).
         The cursor is the raw Monarch API offset, not the count of credits.
         """
-        mm = await get_mm()
+        mm = await self._get_mm()
         transactions = await search_transactions_with_icons(
             mm,
             search=search,
@@ -284,12 +370,13 @@ class RefundsService:
                     "expectedNote": m.expected_note,
                     "expectedAmount": m.expected_amount,
                     "transactionData": (
-                        json.loads(m.transaction_data) if m.transaction_data else None
+                        _parse_transaction_data(m.transaction_data) if m.transaction_data else None
                     ),
                 }
                 for m in matches
             ]
 
+    @_drops_mm_on_error
     async def create_match(
         self,
         original_transaction_id: str,
@@ -317,16 +404,14 @@ class RefundsService:
         Stores match in local DB, updates Monarch transaction notes,
         and optionally replaces tags (not for expected refunds).
         """
+        replace_tags = replace_tag and not expected_refund and original_tag_ids is not None
+
         # Store match in local DB
         with db_session() as session:
             repo = TrackerRepository(session)
 
-            # Check for existing match
-            existing = repo.get_refunds_match_by_original(original_transaction_id)
-            if existing:
-                return {"success": False, "error": "Transaction already matched"}
-
-            repo.create_refunds_match(
+            # The unique index on original_transaction_id rejects duplicates
+            created = repo.create_refunds_match(
                 original_transaction_id=original_transaction_id,
                 refund_transaction_id=refund_transaction_id,
                 refund_amount=refund_amount,
@@ -340,65 +425,58 @@ class RefundsService:
                 expected_account_id=expected_account_id,
                 expected_note=expected_note,
                 expected_amount=expected_amount,
-                transaction_data=json.dumps(transaction_data) if transaction_data else None,
+                transaction_data=_json_dumps(transaction_data) if transaction_data else None,
+            )
+            if not created:
+                return {"success": False, "error": "Transaction already matched"}
+
+            replacement_tag_id = (
+                repo.get_refunds_config().replacement_tag_id if replace_tags else None
             )
 
-        # Update Monarch transaction notes for expected refunds
+        # Note for expected refunds, or for matches (if not skipped)
+        note_line: str | None = None
         if expected_refund and expected_amount is not None:
-            try:
-                mm = await get_mm()
-                note_line = _build_expected_refund_note(
-                    expected_amount, expected_date, expected_account, expected_note
-                )
-                # Strip any previous Eclosion blocks and decode HTML entities
-                base_notes = _prepare_original_notes(original_notes)
-                new_notes = f"{base_notes}\n\n{note_line}" if base_notes else note_line
-                await update_transaction_notes(mm, original_transaction_id, new_notes)
-            except Exception:
-                logger.exception("Failed to update transaction notes in Monarch")
-
-        # Update Monarch transaction notes (if not skipped and not expected)
+            note_line = _build_expected_refund_note(
+                expected_amount, expected_date, expected_account, expected_note
+            )
         elif not skipped and not expected_refund and refund_amount is not None:
-            try:
-                mm = await get_mm()
-                note_line = _build_refund_note(
-                    refund_amount, refund_merchant, refund_date, refund_account
+            note_line = _build_refund_note(
+                refund_amount, refund_merchant, refund_date, refund_account
+            )
+
+        if note_line is None and not replace_tags:
+            return {"success": True}
+
+        try:
+            mm = await self._get_mm()
+        except Exception:
+            logger.exception("Failed to connect to Monarch to update matched transaction")
+            return {"success": True}
+
+        # Notes and tags are independent, so update both at once (best-effort)
+        updates = []
+        if note_line is not None:
+            updates.append(
+                _append_refund_note(mm, original_transaction_id, original_notes, note_line)
+            )
+        if replace_tags and original_tag_ids is not None:
+            updates.append(
+                _replace_matched_tags(
+                    mm, original_transaction_id, original_tag_ids, view_tag_ids, replacement_tag_id
                 )
-                # Strip any previous Eclosion blocks and decode HTML entities
-                base_notes = _prepare_original_notes(original_notes)
-                new_notes = f"{base_notes}\n\n{note_line}" if base_notes else note_line
-                await update_transaction_notes(mm, original_transaction_id, new_notes)
-            except Exception:
-                logger.exception("Failed to update transaction notes in Monarch")
-
-        # Replace or remove tags if configured (not for expected refunds)
-        if replace_tag and not expected_refund and original_tag_ids is not None:
-            try:
-                mm = await get_mm()
-                config = await self.get_config()
-                replacement_tag_id = config.get("replacementTagId")
-
-                # Remove only the active view's tags (preserving other views' tags),
-                # or fall back to removing all original tags if view_tag_ids not provided
-                tags_to_remove = set(view_tag_ids) if view_tag_ids else set(original_tag_ids)
-                new_tag_ids = [tid for tid in original_tag_ids if tid not in tags_to_remove]
-
-                # Add replacement tag if configured and not already present
-                if replacement_tag_id and replacement_tag_id not in new_tag_ids:
-                    new_tag_ids.append(replacement_tag_id)
-
-                await set_transaction_tags(mm, original_transaction_id, new_tag_ids)
-            except Exception:
-                logger.exception("Failed to update transaction tags in Monarch")
+            )
+        if not all(await asyncio.gather(*updates)):
+            self._drop_mm()
 
         return {"success": True}
 
+    @_drops_mm_on_error
     async def delete_match(self, match_id: str) -> dict[str, Any]:
         """Delete a refund match or expected refund, restoring original tags/notes."""
         with db_session() as session:
             repo = TrackerRepository(session)
-            matches = repo.get_refunds_matches()
-            match = next((m for m in matches if m.id == match_id), None)
+            match = repo.get_refunds_match(match_id)
             if not match:
                 return {"success": False, "error": "Match not found"}
 
@@ -410,10 +488,10 @@ class RefundsService:
             original_transaction_id = match.original_transaction_id
             if not is_expected and match.transaction_data:
                 try:
-                    snapshot = json.loads(match.transaction_data)
+                    snapshot = orjson.loads(match.transaction_data)
                     tags = snapshot.get("tags", [])
                     original_tag_ids = [t["id"] for t in tags if "id" in t]
-                except (json.JSONDecodeError, TypeError):
+                except (orjson.JSONDecodeError, TypeError):
                     pass
 
             # Track whether we added notes (expected or matched, not skipped)
@@ -424,81 +502,183 @@ class RefundsService:
         if not deleted:
             return {"success": False}
 
-        mm = await get_mm()
+        mm = await self._get_mm()
 
-        # Strip Eclosion note blocks from Monarch transaction (best-effort)
+        # Strip our note blocks and restore tags concurrently (best-effort, after DB commit)
+        updates = []
         if should_strip_notes:
-            try:
-                current_notes = await get_transaction_notes(mm, original_transaction_id)
-                if current_notes and _BLOCK_PATTERN.search(current_notes):
-                    cleaned = _strip_refund_notes(_decode_html(current_notes))
-                    await update_transaction_notes(mm, original_transaction_id, cleaned)
-            except Exception:
-                logger.exception("Failed to strip refund notes from Monarch transaction")
-
-        # Restore tags in Monarch (best-effort, after DB commit)
+            updates.append(_strip_transaction_refund_notes(mm, original_transaction_id))
         if original_tag_ids is not None:
-            try:
-                await set_transaction_tags(mm, original_transaction_id, original_tag_ids)
-            except Exception:
-                logger.exception("Failed to restore transaction tags in Monarch")
+            updates.append(_restore_transaction_tags(mm, original_transaction_id, original_tag_ids))
+        if not all(await asyncio.gather(*updates)):
+            self._drop_mm()
 
         return {"success": True}
 
 
-def _parse_view_filters(
-    views: list[Any],
-) -> list[tuple[str, list[str], list[str] | None, bool]]:
-    """Parse saved views into (view_id, tag_ids, category_ids, exclude_from_all) tuples."""
-    return [
-        (
-            v.id,
-            json.loads(v.tag_ids),
-            json.loads(v.category_ids) if v.category_ids else None,
-            v.exclude_from_all,
+async def _strip_transaction_refund_notes(mm: Any, transaction_id: str) -> bool:
+    """Strip Eclosion note blocks from a Monarch transaction (best-effort).
+
+    Returns False if the Monarch call failed.
+    """
+    try:
+        current_notes = await get_transaction_notes(mm, transaction_id)
+        if current_notes and _BLOCK_PATTERN.search(current_notes):
+            cleaned = _strip_refund_notes(_decode_html(current_notes))
+            await update_transaction_notes(mm, transaction_id, cleaned)
+    except Exception:
+        logger.exception("Failed to strip refund notes from Monarch transaction")
+        return False
+    return True
+
+
+async def _restore_transaction_tags(mm: Any, transaction_id: str, tag_ids: list[str]) -> bool:
+    """Restore a Monarch transaction's tags from the match snapshot (best-effort).
+
+    Returns False if the Monarch call failed.
+    """
+    try:
+        await set_transaction_tags(mm, transaction_id, tag_ids)
+    except Exception:
+        logger.exception("Failed to restore transaction tags in Monarch")
+        return False
+    return True
+
+
+def _json_dumps(value: Any) -> str:
+    """Encode a view filter or match snapshot for storage in a TEXT column."""
+    return orjson.dumps(value).decode()
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_transaction_data(raw: str) -> Any:
+    """Decode a match's stored transaction snapshot, reusing earlier decodes.
+
+    Keyed on the stored JSON itself, so it can't go stale. The result is
+    shared between calls and must not be mutated.
+    """
+    return orjson.loads(raw)
+
+
+def _load_view_filter(view: Any) -> tuple[list[str], list[str] | None]:
+    """Get a view's parsed (tag_ids, category_ids), decoding the JSON only once per edit.
+
+    The returned lists are shared with the cache; callers must not mutate them.
+    """
+    key = (view.id, view.updated_at)
+    cached = _VIEW_FILTER_CACHE.get(key)
+    if cached is None:
+        if len(_VIEW_FILTER_CACHE) >= _VIEW_FILTER_CACHE_MAX:
+            _VIEW_FILTER_CACHE.clear()
+        cached = (
+            orjson.loads(view.tag_ids),
+            orjson.loads(view.category_ids) if view.category_ids else None,
         )
-        for v in views
-    ]
+        _VIEW_FILTER_CACHE[key] = cached
+    return cached
 
 
-def _txn_matches_view(
-    txn: dict[str, Any],
-    tag_set: set[str],
-    cat_set: set[str] | None,
+async def _append_refund_note(
+    mm: Any, transaction_id: str, original_notes: str | None, note_line: str
 ) -> bool:
-    """Check whether a transaction belongs to a view's tag/category filters."""
-    txn_tags = {t["id"] for t in txn.get("tags", [])}
-    tags_match = bool(tag_set) and bool(tag_set & txn_tags)
-    if not tags_match and cat_set is None:
+    """Append a refund note block to a Monarch transaction's notes (best-effort).
+
+    Returns False if the Monarch call failed.
+    """
+    try:
+        new_notes = _append_note(original_notes, note_line)
+        await update_transaction_notes(mm, transaction_id, new_notes)
+    except Exception:
+        logger.exception("Failed to update transaction notes in Monarch")
         return False
-    cat_id = (txn.get("category") or {}).get("id")
-    cats_match = cat_set is not None and cat_id is not None and cat_id in cat_set
-    if not tags_match and not cats_match:
+    return True
+
+
+async def _replace_matched_tags(
+    mm: Any,
+    transaction_id: str,
+    original_tag_ids: list[str],
+    view_tag_ids: list[str] | None,
+    replacement_tag_id: str | None,
+) -> bool:
+    """Swap a matched transaction's view tags for the replacement tag (best-effort).
+
+    Returns False if the Monarch call failed.
+    """
+    try:
+        # Remove only the active view's tags (preserving other views' tags),
+        # or fall back to removing all original tags if view_tag_ids not provided
+        tags_to_remove = set(view_tag_ids) if view_tag_ids else set(original_tag_ids)
+        new_tag_ids = [tid for tid in original_tag_ids if tid not in tags_to_remove]
+
+        # Add replacement tag if configured and not already present
+        if replacement_tag_id and replacement_tag_id not in new_tag_ids:
+            new_tag_ids.append(replacement_tag_id)
+
+        await set_transaction_tags(mm, transaction_id, new_tag_ids)
+    except Exception:
+        logger.exception("Failed to update transaction tags in Monarch")
         return False
-    return not (cat_set is not None and not cats_match)
+    return True
+
+
+def _parse_view_filters(
+    views: list[Any],
+) -> list[tuple[str, frozenset[str], frozenset[str] | None, bool]]:
+    """Parse saved views into (view_id, tag_set, category_set, exclude_from_all) tuples.
+
+    An empty category list is treated like no category filter.
+    """
+    filters = []
+    for v in views:
+        tag_ids, cat_ids = _load_view_filter(v)
+        filters.append(
+            (v.id, frozenset(tag_ids), frozenset(cat_ids) if cat_ids else None, v.exclude_from_all)
+        )
+    return filters
 
 
 def _compute_view_counts(
-    view_filters: list[tuple[str, list[str], list[str] | None, bool]],
+    view_filters: list[tuple[str, frozenset[str], frozenset[str] | None, bool]],
     unmatched_expenses: list[dict[str, Any]],
 ) -> dict[str, Any]:
     """Compute per-view and global unmatched counts.
 
     The global count only includes transactions from views where
     excludeFromAll is False, matching the All tab behavior.
+
+    A view with a category filter matches on category alone; a view without
+    one matches any transaction carrying one of its tags. Both are indexed
+    up front so each transaction is visited once rather than once per view.
     """
     view_counts: dict[str, int] = {}
+    included_views: set[str] = set()
+    tag_to_views: dict[str, list[str]] = {}
+    cat_to_views: dict[str, list[str]] = {}
+    for view_id, tag_set, cat_set, exclude_from_all in view_filters:
+        view_counts[view_id] = 0
+        if not exclude_from_all:
+            included_views.add(view_id)
+        if cat_set is not None:
+            for cat_id in cat_set:
+                cat_to_views.setdefault(cat_id, []).append(view_id)
+        else:
+            for tag_id in tag_set:
+                tag_to_views.setdefault(tag_id, []).append(view_id)
+
     global_unmatched_ids: set[str] = set()
-    for view_id, tag_ids, cat_ids, exclude_from_all in view_filters:
-        tag_set = set(tag_ids)
-        cat_set = set(cat_ids) if cat_ids else None
-        count = 0
-        for txn in unmatched_expenses:
-            if _txn_matches_view(txn, tag_set, cat_set):
-                count += 1
-                if not exclude_from_all:
-                    global_unmatched_ids.add(txn["id"])
-        view_counts[view_id] = count
+    for txn in unmatched_expenses:
+        # A transaction with several tags from one view still counts once
+        matched_views: set[str] = set()
+        for tag in txn.get("tags", []):
+            matched_views.update(tag_to_views.get(tag["id"], ()))
+        txn_cat_id = (txn.get("category") or {}).get("id")
+        if txn_cat_id is not None:
+            matched_views.update(cat_to_views.get(txn_cat_id, ()))
+        for view_id in matched_views:
+            view_counts[view_id] += 1
+        if not included_views.isdisjoint(matched_views):
+            global_unmatched_ids.add(txn["id"])
     return {"count": len(global_unmatched_ids), "viewCounts": view_counts}
 
 
@@ -516,11 +696,13 @@ _BLOCK_PATTERN = re.compile(
     r"\n?── (?:Refund Matched|Expected Refund) ──\n.*?──────────\n?",
     re.DOTALL,
 )
+_MULTI_BLANK = re.compile(r"\n{3,}")
 
 
 def _decode_html(text: str) -> str:
     """Decode HTML entities in text from the Monarch API."""
-    return html.unescape(text)
+    # Every entity starts with "&"; most strings have none and need no scan
+    return html.unescape(text) if "&" in text else text
 
 
 def _strip_refund_notes(notes: str) -> str:
@@ -528,16 +710,30 @@ def _strip_refund_notes(notes: str) -> str:
 
     Removes matched/expected refund blocks and cleans up extra whitespace.
     """
-    cleaned = _BLOCK_PATTERN.sub("", notes)
+    # Every block starts with a "──" marker, so most notes skip the regex entirely
+    cleaned = _BLOCK_PATTERN.sub("", notes) if "──" in notes else notes
     # Collapse multiple blank lines into one, strip leading/trailing whitespace
-    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    if "\n\n\n" in cleaned:
+        cleaned = _MULTI_BLANK.sub("\n\n", cleaned)
     return cleaned.strip()
 
 
+def _format_note_date(value: str) -> str:
+    """Format a YYYY-MM-DD date as M/D/YYYY, passing anything else through unchanged.
+
+    Formats the parts directly since %-m/%-d are POSIX-only and fail on Windows.
+    """
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return value
+    return f"{parsed.month}/{parsed.day}/{parsed.year}"
+
+
 def _build_refund_note(
     amount: float | None,
     merchant: str | None,
-    date: str | None,
+    txn_date: str | None,
     account: str | None,
 ) -> str:
     """Build a wrapped note block for a matched refund."""
@@ -546,12 +742,8 @@ def _build_refund_note(
         parts.append(f"${abs(amount):.2f}")
     if merchant:
         parts.append(f'from "{_decode_html(merchant)}"')
-    if date:
-        try:
-            dt = datetime.strptime(date, "%Y-%m-%d")
-            parts.append(f"on {dt.strftime('%-m/%-d/%Y')}")
-        except ValueError:
-            parts.append(f"on {date}")
+    if txn_date:
+        parts.append(f"on {_format_note_date(txn_date)}")
     if account:
         parts.append(f"via {_decode_html(account)}")
     body = " ".join(parts)
@@ -560,7 +752,7 @@ def _build_refund_note(
 
 def _build_expected_refund_note(
     amount: float | None,
-    date: str | None,
+    expected_date: str | None,
     account: str | None,
     note: str | None,
 ) -> str:
@@ -568,12 +760,8 @@ def _build_expected_refund_note(
     parts: list[str] = []
     if amount is not None:
         parts.append(f"${abs(amount):.2f}")
-    if date:
-        try:
-            dt = datetime.strptime(date, "%Y-%m-%d")
-            parts.append(f"expected by {dt.strftime('%-m/%-d/%Y')}")
-        except ValueError:
-            parts.append(f"expected by {date}")
+    if expected_date:
+        parts.append(f"expected by {_format_note_date(expected_date)}")
     if account:
         parts.append(f"to {_decode_html(account)}")
     body = " ".join(parts)
@@ -582,8 +770,16 @@ def _build_expected_refund_note(
     return f"{_EXPECTED_MARKER}\n{body}\n{_BLOCK_END}"
 
 
-def _prepare_original_notes(original_notes: str | None) -> str:
-    """Clean original notes: strip existing Eclosion blocks and decode HTML entities."""
+def _append_note(original_notes: str | None, note_line: str) -> str:
+    """Append a note block to the original notes, replacing any earlier Eclosion blocks.
+
+    Notes with no HTML entities, blocks, or blank-line runs only need trimming,
+    so they skip decoding and stripping.
+    """
     if not original_notes:
-        return ""
-    return _strip_refund_notes(_decode_html(original_notes))
+        return note_line
+    if "&" in original_notes or "──" in original_notes or "\n\n\n" in original_notes:
+        base_notes = _strip_refund_notes(_decode_html(original_notes))
+    else:
+        base_notes = original_notes.strip()
+    return f"{base_notes}\n\n{note_line}" if base_notes else note_line
@@ -41,8 +41,9 @@ class RollupService:
         recalculate with correct proportions on next get_rollup_data() call.
         """
         state = self.state_manager.load()
-        for item_id in state.rollup.item_ids:
-            self.state_manager.clear_frozen_target(f"rollup_{item_id}")
+        self.state_manager.clear_frozen_targets(
+            [f"rollup_{item_id}" for item_id in state.rollup.item_ids]
+        )
 
     async def toggle_rollup(self, enabled: bool) -> dict[str, Any]:
         """
@@ -3,24 +3,29 @@ Security Service
 
 Manages security event logging and retrieval:
 - SQLite database for persistent event storage
-- IP geolocation with caching via ip-api.com
+- IP geolocation with caching via ip-api.com, resolved off the request thread
 - Event filtering, pagination, and export
 - 90-day automatic retention cleanup
 """
 
 import csv
+import html
+import http.client
 import io
 import ipaddress
 import json
 import logging
+import queue
 import sqlite3
 import threading
-import urllib.error
+import time
 import urllib.parse
-import urllib.request
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 
 from core import config
 
@@ -42,10 +47,11 @@ CREATE TABLE IF NOT EXISTS security_events (
 
 CREATE INDEX IF NOT EXISTS idx_security_events_timestamp
     ON security_events(timestamp DESC);
-CREATE INDEX IF NOT EXISTS idx_security_events_type
-    ON security_events(event_type);
-CREATE INDEX IF NOT EXISTS idx_security_events_success
-    ON security_events(success);
+CREATE INDEX IF NOT EXISTS idx_security_events_type_success_ts
+    ON security_events(event_type, success, timestamp DESC);
+-- Superseded by the composite index above
+DROP INDEX IF EXISTS idx_security_events_type;
+DROP INDEX IF EXISTS idx_security_events_success;
 
 CREATE TABLE IF NOT EXISTS ip_geolocation_cache (
     ip_address TEXT PRIMARY KEY,
@@ -70,12 +76,117 @@ CREATE INDEX IF NOT EXISTS idx_ip_lockouts_locked_until
     ON ip_lockouts(locked_until);
 """
 
+# Applied to every connection. WAL with synchronous=NORMAL only fsyncs at
+# checkpoints, so each event insert no longer pays for a full disk sync.
+SQLITE_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-20000;
+"""
+
+# All summary statistics in a single pass over security_events
+SUMMARY_SQL = """
+SELECT
+    COUNT(*) AS total,
+    COUNT(CASE WHEN event_type = 'LOGIN_ATTEMPT' AND success = 1 THEN 1 END)
+        AS successful_logins,
+    COUNT(CASE WHEN event_type = 'LOGIN_ATTEMPT' AND success = 0 THEN 1 END)
+        AS failed_logins,
+    COUNT(
+        CASE WHEN event_type IN ('UNLOCK_ATTEMPT', 'UNLOCK_AND_VALIDATE') AND success = 0
+        THEN 1 END
+    ) AS failed_unlocks,
+    COUNT(CASE WHEN event_type = 'LOGOUT' THEN 1 END) AS logouts,
+    COUNT(CASE WHEN event_type = 'SESSION_TIMEOUT' THEN 1 END) AS timeouts,
+    COUNT(DISTINCT ip_address) AS unique_ips,
+    MAX(CASE WHEN event_type = 'LOGIN_ATTEMPT' AND success = 1 THEN timestamp END)
+        AS last_success,
+    MAX(CASE WHEN event_type = 'LOGIN_ATTEMPT' AND success = 0 THEN timestamp END)
+        AS last_failed
+FROM security_events
+"""
+
+# Statements run on every request, shared between the methods that need them
+# and kept prepared by each connection's statement cache
+INSERT_EVENT_SQL = """
+INSERT INTO security_events
+(event_type, success, timestamp, ip_address, details, user_agent)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+SELECT_LOCKED_UNTIL_SQL = "SELECT locked_until FROM ip_lockouts WHERE ip_address = ?"
+# Bumps the failure count and sets the lockout in one statement. SET
+# expressions see the row as it was before the update.
+RECORD_FAILED_ATTEMPT_SQL = """
+INSERT INTO ip_lockouts (ip_address, failed_attempts, locked_until, last_attempt)
+VALUES (:ip, 1, CASE WHEN 1 >= :threshold THEN :locked_until END, :now)
+ON CONFLICT(ip_address) DO UPDATE SET
+    failed_attempts = failed_attempts + 1,
+    locked_until = CASE WHEN failed_attempts + 1 >= :threshold THEN :locked_until END,
+    last_attempt = excluded.last_attempt
+RETURNING failed_attempts
+"""
+GET_PREFERENCE_SQL = "SELECT value FROM security_preferences WHERE key = ?"
+SET_PREFERENCE_SQL = "INSERT OR REPLACE INTO security_preferences (key, value) VALUES (?, ?)"
+
+# Room for the per-request statements plus every get_events filter combination
+STATEMENT_CACHE_SIZE = 256
+
+# Connections shared by all threads. Werkzeug starts a thread per request, so
+# callers borrow one of these instead of opening a connection per thread.
+CONNECTION_POOL_SIZE = 4
+
+# Newest events first, matching the events list in the UI
+EXPORT_EVENTS_SQL = """
+SELECT id, event_type, success, timestamp, ip_address, country, city, details
+FROM security_events
+ORDER BY timestamp DESC
+LIMIT ?
+"""
+EXPORT_LIMIT = 10000
+
+# CSV export sanitization: control characters some CSV readers choke on, and
+# leading characters spreadsheets treat as formulas
+_CSV_CONTROL_CHARS = str.maketrans({"\r": " ", "\n": " ", "\t": " "})
+_CSV_FORMULA_PREFIXES = frozenset("=+-@|%")
+
+GEOLOCATION_API_HOST = "ip-api.com"
+
+# Geolocation cache lifetime, and how many IPs to also keep in memory
+GEOLOCATION_CACHE_TTL = timedelta(days=7)
+GEOLOCATION_MEMORY_CACHE_SIZE = 4096
+
+# Address prefixes that are always private/local, checked before parsing
+_LOCAL_IP_PREFIXES = ("127.", "10.", "192.168.", "169.254.", "::1", "fe80:", "fc", "fd")
+
+# Retention cleanup: first run shortly after startup, then daily, deleting in
+# batches so a large purge never holds the write lock for long
+CLEANUP_INITIAL_DELAY_SECONDS = 1.0
+CLEANUP_INTERVAL_SECONDS = 24 * 60 * 60
+CLEANUP_BATCH_SIZE = 1000
+DELETE_EXPIRED_EVENTS_SQL = """
+DELETE FROM security_events WHERE id IN (
+    SELECT id FROM security_events WHERE timestamp < ? LIMIT ?
+)
+"""
+
 # Lockout configuration
 LOCKOUT_THRESHOLD = 10  # Failed attempts before lockout
 LOCKOUT_DURATION_MINUTES = 15  # How long to lock out an IP
 
 
-@dataclass
+def _is_obviously_local_ip(ip_address: str) -> bool:
+    """Cheap string check for common private/loopback addresses."""
+    if ip_address.startswith(_LOCAL_IP_PREFIXES):
+        return True
+    # 172.16.0.0/12
+    if ip_address.startswith("172."):
+        second_octet = ip_address[4:].partition(".")[0]
+        return second_octet.isdigit() and 16 <= int(second_octet) <= 31
+    return False
+
+
+@dataclass(slots=True, frozen=True)
 class SecurityEvent:
     """Represents a security event."""
 
@@ -90,7 +201,7 @@ class SecurityEvent:
     user_agent: str | None = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SecurityEventSummary:
     """Summary statistics for security events."""
 
@@ -105,6 +216,21 @@ class SecurityEventSummary:
     last_failed_login: str | None = None
 
 
+def _event_from_row(row: sqlite3.Row) -> SecurityEvent:
+    """Build a SecurityEvent from a security_events row."""
+    return SecurityEvent(
+        id=row["id"],
+        event_type=row["event_type"],
+        success=bool(row["success"]),
+        timestamp=row["timestamp"],
+        ip_address=row["ip_address"],
+        country=row["country"],
+        city=row["city"],
+        details=row["details"],
+        user_agent=row["user_agent"],
+    )
+
+
 class SecurityService:
     """Manages security event logging and retrieval."""
 
@@ -112,8 +238,10 @@ class SecurityService:
     _lock = threading.Lock()
     _initialized: bool = False
 
+    SUMMARY_CACHE_TTL_SECONDS = 5.0
+
     def __new__(cls) -> "SecurityService":
-        """Singleton pattern to ensure single database connection."""
+        """Singleton pattern to ensure a single service instance."""
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
@@ -126,37 +254,107 @@ class SecurityService:
             return
         self._initialized = True
         self._db_path = config.SECURITY_DB_FILE
-        self._conn: sqlite3.Connection | None = None
+        # Opened lazily up to CONNECTION_POOL_SIZE; LIFO keeps reusing the
+        # warmest connection. WAL lets readers run alongside a writer.
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
+        # Per-thread ip-api.com connection for the geolocation worker
+        self._local = threading.local()
+        # IP -> event row ids waiting on a geolocation lookup
+        self._geo_pending: dict[str, list[int]] = {}
+        self._geo_lock = threading.Lock()
+        self._geo_q: queue.Queue[str] = queue.Queue()
+        self._geo_thread: threading.Thread | None = None
+        # IP -> (monotonic expiry, (country, city)), in front of ip_geolocation_cache
+        self._geo_memory: OrderedDict[str, tuple[float, tuple[str | None, str | None]]] = (
+            OrderedDict()
+        )
+        self._geo_memory_lock = threading.Lock()
+        # Dropped on every write to security_events
+        self._summary_cache: tuple[float, SecurityEventSummary] | None = None
+        # Preferences are only written through this instance, so this mirrors the table
+        self._preference_cache: dict[str, str | None] = {}
+        self._cleanup_timer: threading.Timer | None = None
         self._init_database()
-        self._cleanup_old_events()
-
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get or create database connection."""
-        if self._conn is None:
-            self._conn = sqlite3.connect(str(self._db_path), check_same_thread=False)
-            self._conn.row_factory = sqlite3.Row
-        return self._conn
+        self._schedule_cleanup(CLEANUP_INITIAL_DELAY_SECONDS)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a configured database connection for the pool."""
+        conn = sqlite3.connect(
+            str(self._db_path),
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SQLITE_PRAGMAS)
+        return conn
+
+    def _checkout_connection(self) -> sqlite3.Connection:
+        """Take an idle pooled connection, opening one if the pool isn't full yet."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._pool_size < CONNECTION_POOL_SIZE:
+                conn = self._open_connection()
+                self._pool_size += 1
+                return conn
+        return self._pool.get()
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled database connection for the duration of the block."""
+        conn = self._checkout_connection()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
 
     def _init_database(self) -> None:
         """Initialize database schema."""
         try:
-            conn = self._get_connection()
-            conn.executescript(SECURITY_DB_SCHEMA)
-            conn.commit()
+            with self._connection() as conn:
+                conn.executescript(SECURITY_DB_SCHEMA)
+                # Refresh planner statistics so the composite index gets picked
+                conn.execute("PRAGMA optimize")
             logger.info("Security database initialized at %s", self._db_path)
         except Exception as e:
             logger.error("Failed to initialize security database: %s", e)
 
+    def _schedule_cleanup(self, delay: float) -> None:
+        """Run retention cleanup on a background timer."""
+        timer = threading.Timer(delay, self._run_scheduled_cleanup)
+        timer.daemon = True
+        timer.start()
+        self._cleanup_timer = timer
+
+    def _run_scheduled_cleanup(self) -> None:
+        """Clean up old events, then schedule the next run."""
+        try:
+            self._cleanup_old_events()
+        finally:
+            self._schedule_cleanup(CLEANUP_INTERVAL_SECONDS)
+
     def _cleanup_old_events(self) -> None:
         """Delete events older than retention period."""
         try:
             cutoff = datetime.now(UTC) - timedelta(days=config.SECURITY_EVENT_RETENTION_DAYS)
             cutoff_str = cutoff.isoformat()
-            conn = self._get_connection()
-            cursor = conn.execute("DELETE FROM security_events WHERE timestamp < ?", (cutoff_str,))
-            deleted = cursor.rowcount
-            conn.commit()
+            deleted = 0
+            while True:
+                with self._connection() as conn, conn:
+                    cursor = conn.execute(
+                        DELETE_EXPIRED_EVENTS_SQL, (cutoff_str, CLEANUP_BATCH_SIZE)
+                    )
+                deleted += cursor.rowcount
+                if cursor.rowcount < CLEANUP_BATCH_SIZE:
+                    break
             if deleted > 0:
+                self._summary_cache = None
                 logger.info("Cleaned up %d old security events", deleted)
         except Exception as e:
             logger.error("Failed to cleanup old security events: %s", e)
@@ -181,32 +379,34 @@ class SecurityService:
         """
         try:
             timestamp = datetime.now(UTC).isoformat()
-            country, city = self._get_geolocation(ip_address) if ip_address else (None, None)
-
-            conn = self._get_connection()
-            conn.execute(
-                """
-                INSERT INTO security_events
-                (event_type, success, timestamp, ip_address, country, city, details, user_agent)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    event_type,
-                    1 if success else 0,
-                    timestamp,
-                    ip_address,
-                    country,
-                    city,
-                    details[:500] if details else None,
-                    user_agent[:256] if user_agent else None,
-                ),
-            )
-            conn.commit()
-
-            # Update last login timestamp if this is a successful login or remote unlock
-            if event_type in ("LOGIN_ATTEMPT", "REMOTE_UNLOCK") and success:
-                self._set_preference("last_login_timestamp", timestamp)
 
+            with self._connection() as conn, conn:
+                cursor = conn.execute(
+                    INSERT_EVENT_SQL,
+                    (
+                        event_type,
+                        1 if success else 0,
+                        timestamp,
+                        ip_address,
+                        details[:500] if details else None,
+                        user_agent[:256] if user_agent else None,
+                    ),
+                )
+                # Update last login timestamp if this is a successful login or remote unlock
+                is_login = event_type in ("LOGIN_ATTEMPT", "REMOTE_UNLOCK") and success
+                if is_login:
+                    conn.execute(SET_PREFERENCE_SQL, ("last_login_timestamp", timestamp))
+            # Only mirror the preference once the transaction has committed
+            if is_login:
+                self._preference_cache["last_login_timestamp"] = timestamp
+            self._summary_cache = None
+
+            if (
+                ip_address
+                and cursor.lastrowid is not None
+                and not _is_obviously_local_ip(ip_address)
+            ):
+                self._enqueue_geolocation(cursor.lastrowid, ip_address)
         except Exception as e:
             logger.error("Failed to log security event: %s", e)
 
@@ -230,9 +430,7 @@ class SecurityService:
             Tuple of (list of SecurityEvent objects, total count matching filters)
         """
         try:
-            conn = self._get_connection()
-
-            # Build WHERE clause for both queries
+            # Build WHERE clause
             where_clause = "WHERE 1=1"
             params: list = []
 
@@ -244,31 +442,24 @@ class SecurityService:
                 where_clause += " AND success = ?"
                 params.append(1 if success else 0)
 
-            # Get total count with filters
-            count_query = f"SELECT COUNT(*) FROM security_events {where_clause}"
-            total = conn.execute(count_query, params).fetchone()[0]
-
-            # Get paginated results
-            query = f"SELECT * FROM security_events {where_clause} ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-
-            events = [
-                SecurityEvent(
-                    id=row["id"],
-                    event_type=row["event_type"],
-                    success=bool(row["success"]),
-                    timestamp=row["timestamp"],
-                    ip_address=row["ip_address"],
-                    country=row["country"],
-                    city=row["city"],
-                    details=row["details"],
-                    user_agent=row["user_agent"],
-                )
-                for row in rows
-            ]
+            # Fetch the page with the filtered total alongside each row
+            query = (
+                f"SELECT *, COUNT(*) OVER () AS total FROM security_events {where_clause} "
+                "ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+            )
+            with self._connection() as conn:
+                rows = conn.execute(query, [*params, limit, offset]).fetchall()
+
+                if rows:
+                    total = rows[0]["total"]
+                elif offset > 0:
+                    # Page past the end: the window has no rows to report the total on
+                    count_query = f"SELECT COUNT(*) FROM security_events {where_clause}"
+                    total = conn.execute(count_query, params).fetchone()[0]
+                else:
+                    total = 0
+
+            events = [_event_from_row(row) for row in rows]
             return events, total
         except Exception as e:
             logger.error("Failed to get security events: %s", e)
@@ -276,72 +467,27 @@ class SecurityService:
 
     def get_summary(self) -> SecurityEventSummary:
         """Get aggregate statistics for security events."""
-        try:
-            conn = self._get_connection()
-
-            # Total events
-            total = conn.execute("SELECT COUNT(*) FROM security_events").fetchone()[0]
-
-            # Successful logins
-            successful_logins = conn.execute(
-                "SELECT COUNT(*) FROM security_events "
-                "WHERE event_type = 'LOGIN_ATTEMPT' AND success = 1"
-            ).fetchone()[0]
-
-            # Failed logins
-            failed_logins = conn.execute(
-                "SELECT COUNT(*) FROM security_events "
-                "WHERE event_type = 'LOGIN_ATTEMPT' AND success = 0"
-            ).fetchone()[0]
-
-            # Failed unlock attempts
-            failed_unlocks = conn.execute(
-                "SELECT COUNT(*) FROM security_events "
-                "WHERE event_type IN ('UNLOCK_ATTEMPT', 'UNLOCK_AND_VALIDATE') "
-                "AND success = 0"
-            ).fetchone()[0]
-
-            # Logouts
-            logouts = conn.execute(
-                "SELECT COUNT(*) FROM security_events WHERE event_type = 'LOGOUT'"
-            ).fetchone()[0]
-
-            # Session timeouts
-            timeouts = conn.execute(
-                "SELECT COUNT(*) FROM security_events WHERE event_type = 'SESSION_TIMEOUT'"
-            ).fetchone()[0]
-
-            # Unique IPs
-            unique_ips = conn.execute(
-                "SELECT COUNT(DISTINCT ip_address) FROM security_events "
-                "WHERE ip_address IS NOT NULL"
-            ).fetchone()[0]
-
-            # Last successful login
-            last_success = conn.execute(
-                "SELECT timestamp FROM security_events "
-                "WHERE event_type = 'LOGIN_ATTEMPT' AND success = 1 "
-                "ORDER BY timestamp DESC LIMIT 1"
-            ).fetchone()
-
-            # Last failed login
-            last_failed = conn.execute(
-                "SELECT timestamp FROM security_events "
-                "WHERE event_type = 'LOGIN_ATTEMPT' AND success = 0 "
-                "ORDER BY timestamp DESC LIMIT 1"
-            ).fetchone()
+        cached = self._summary_cache
+        if cached is not None and time.monotonic() - cached[0] < self.SUMMARY_CACHE_TTL_SECONDS:
+            return cached[1]
 
-            return SecurityEventSummary(
-                total_events=total,
-                successful_logins=successful_logins,
-                failed_logins=failed_logins,
-                failed_unlock_attempts=failed_unlocks,
-                logouts=logouts,
-                session_timeouts=timeouts,
-                unique_ips=unique_ips,
-                last_successful_login=last_success[0] if last_success else None,
-                last_failed_login=last_failed[0] if last_failed else None,
+        try:
+            with self._connection() as conn:
+                row = conn.execute(SUMMARY_SQL).fetchone()
+
+            summary = SecurityEventSummary(
+                total_events=row["total"],
+                successful_logins=row["successful_logins"],
+                failed_logins=row["failed_logins"],
+                failed_unlock_attempts=row["failed_unlocks"],
+                logouts=row["logouts"],
+                session_timeouts=row["timeouts"],
+                unique_ips=row["unique_ips"],
+                last_successful_login=row["last_success"],
+                last_failed_login=row["last_failed"],
             )
+            self._summary_cache = (time.monotonic(), summary)
+            return summary
         except Exception as e:
             logger.error("Failed to get security summary: %s", e)
             return SecurityEventSummary(
@@ -364,7 +510,6 @@ class SecurityService:
             last_login = self._get_preference("last_login_timestamp")
             dismissed_at = self._get_preference("alert_dismissed_at")
 
-            conn = self._get_connection()
             query = """
                 SELECT * FROM security_events
                 WHERE event_type IN ('LOGIN_ATTEMPT', 'UNLOCK_ATTEMPT', 'UNLOCK_AND_VALIDATE', 'REMOTE_UNLOCK')
@@ -387,23 +532,10 @@ class SecurityService:
 
             query += " ORDER BY timestamp DESC LIMIT 10"
 
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-
-            return [
-                SecurityEvent(
-                    id=row["id"],
-                    event_type=row["event_type"],
-                    success=bool(row["success"]),
-                    timestamp=row["timestamp"],
-                    ip_address=row["ip_address"],
-                    country=row["country"],
-                    city=row["city"],
-                    details=row["details"],
-                    user_agent=row["user_agent"],
-                )
-                for row in rows
-            ]
+            with self._connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+
+            return [_event_from_row(row) for row in rows]
         except Exception as e:
             logger.error("Failed to get failed attempts since last login: %s", e)
             return []
@@ -415,9 +547,9 @@ class SecurityService:
     def clear_events(self) -> None:
         """Delete all security event logs."""
         try:
-            conn = self._get_connection()
-            conn.execute("DELETE FROM security_events")
-            conn.commit()
+            with self._connection() as conn, conn:
+                conn.execute("DELETE FROM security_events")
+            self._summary_cache = None
             logger.info("Security events cleared")
         except Exception as e:
             logger.error("Failed to clear security events: %s", e)
@@ -430,16 +562,12 @@ class SecurityService:
         - Removes control characters that could cause issues
         - Prefixes with single quote if value starts with formula characters
         """
-        import html
-
         if value is None:
             return ""
-        # Convert to string and escape HTML entities
-        safe_value = html.escape(str(value))
-        # Remove control characters (CR, LF, Tab can cause issues in some CSV readers)
-        safe_value = safe_value.replace("\r", " ").replace("\n", " ").replace("\t", " ")
+        # Escape HTML entities, then blank out CR/LF/Tab in one pass
+        safe_value = html.escape(str(value)).translate(_CSV_CONTROL_CHARS)
         # Prevent CSV formula injection (values starting with =, +, -, @, |, %)
-        if safe_value and safe_value[0] in "=+-@|%":
+        if safe_value and safe_value[0] in _CSV_FORMULA_PREFIXES:
             safe_value = "'" + safe_value
         return safe_value
 
@@ -451,7 +579,6 @@ class SecurityService:
             CSV string of all events with sanitized values
         """
         try:
-            events, _ = self.get_events(limit=10000, offset=0)
             output = io.StringIO()
             writer = csv.writer(output)
 
@@ -469,19 +596,21 @@ class SecurityService:
                 ]
             )
 
-            # Data rows with sanitized values
-            for event in events:
-                writer.writerow(
-                    [
-                        event.id,
-                        self._sanitize_csv_value(event.event_type),
-                        "Yes" if event.success else "No",
-                        self._sanitize_csv_value(event.timestamp),
-                        self._sanitize_csv_value(event.ip_address),
-                        self._sanitize_csv_value(event.country),
-                        self._sanitize_csv_value(event.city),
-                        self._sanitize_csv_value(event.details),
-                    ]
+            # Data rows with sanitized values, streamed from the cursor
+            sanitize = self._sanitize_csv_value
+            with self._connection() as conn:
+                writer.writerows(
+                    (
+                        row["id"],
+                        sanitize(row["event_type"]),
+                        "Yes" if row["success"] else "No",
+                        sanitize(row["timestamp"]),
+                        sanitize(row["ip_address"]),
+                        sanitize(row["country"]),
+                        sanitize(row["city"]),
+                        sanitize(row["details"]),
+                    )
+                    for row in conn.execute(EXPORT_EVENTS_SQL, (EXPORT_LIMIT,))
                 )
 
             return output.getvalue()
@@ -489,6 +618,55 @@ class SecurityService:
             logger.error("Failed to export security events: %s", e)
             return ""
 
+    def _enqueue_geolocation(self, event_id: int, ip_address: str) -> None:
+        """
+        Queue an event for background geolocation.
+
+        Events are inserted without country/city so the caller never waits on
+        ip-api.com. Repeat events from an IP that is already being looked up
+        share the pending lookup instead of queueing another request.
+        """
+        with self._geo_lock:
+            pending = self._geo_pending.get(ip_address)
+            if pending is not None:
+                pending.append(event_id)
+                return
+            self._geo_pending[ip_address] = [event_id]
+            if self._geo_thread is None or not self._geo_thread.is_alive():
+                self._geo_thread = threading.Thread(
+                    target=self._geolocation_worker, name="security-geolocation", daemon=True
+                )
+                self._geo_thread.start()
+        self._geo_q.put(ip_address)
+
+    def _geolocation_worker(self) -> None:
+        """Resolve queued IPs and fill in country/city on their events."""
+        while True:
+            ip_address = self._geo_q.get()
+            try:
+                country, city = self._get_geolocation(ip_address)
+            except Exception as e:
+                logger.warning("Geolocation worker failed: %s", e)
+                country, city = None, None
+            with self._geo_lock:
+                event_ids = self._geo_pending.pop(ip_address, [])
+            if country or city:
+                self._apply_geolocation(event_ids, country, city)
+            self._geo_q.task_done()
+
+    def _apply_geolocation(
+        self, event_ids: list[int], country: str | None, city: str | None
+    ) -> None:
+        """Write resolved geolocation onto logged events."""
+        try:
+            with self._connection() as conn, conn:
+                conn.executemany(
+                    "UPDATE security_events SET country = ?, city = ? WHERE id = ?",
+                    [(country, city, event_id) for event_id in event_ids],
+                )
+        except Exception as e:
+            logger.warning("Failed to apply geolocation: %s", e)
+
     def _get_geolocation(self, ip_address: str) -> tuple[str | None, str | None]:
         """
         Look up country/city for an IP address using ip-api.com.
@@ -504,6 +682,8 @@ class SecurityService:
         if not ip_address:
             logger.debug("[Geolocation] No IP address provided")
             return None, None
+        if _is_obviously_local_ip(ip_address):
+            return None, None
         try:
             parsed_ip = ipaddress.ip_address(ip_address)
         except ValueError:
@@ -530,22 +710,18 @@ class SecurityService:
         try:
             # Use quote() to URL-encode the IP for SSRF prevention (CodeQL recognizes this)
             safe_ip = urllib.parse.quote(str(parsed_ip), safe="")
-            url = f"http://ip-api.com/json/{safe_ip}?fields=status,country,city"
-            req = urllib.request.Request(url, headers={"User-Agent": "Eclosion/1.0"})
+            path = f"/json/{safe_ip}?fields=status,country,city"
             logger.debug("[Geolocation] Looking up IP: %s", ip_address)
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode())
-                logger.debug("[Geolocation] API response for %s: %s", ip_address, data)
-                if data.get("status") == "success":
-                    country = data.get("country")
-                    city = data.get("city")
-                    self._cache_geolocation(ip_address, country, city)
-                    logger.debug("[Geolocation] Success: %s -> %s, %s", ip_address, city, country)
-                    return country, city
-                else:
-                    logger.debug(
-                        "[Geolocation] API returned non-success for %s: %s", ip_address, data
-                    )
+            data = self._fetch_geolocation(path)
+            logger.debug("[Geolocation] API response for %s: %s", ip_address, data)
+            if data is not None and data.get("status") == "success":
+                country = data.get("country")
+                city = data.get("city")
+                self._cache_geolocation(ip_address, country, city)
+                logger.debug("[Geolocation] Success: %s -> %s, %s", ip_address, city, country)
+                return country, city
+            else:
+                logger.debug("[Geolocation] API returned non-success for %s: %s", ip_address, data)
         except Exception as e:
             # Sanitize error message to prevent log injection using replace() chains
             sanitized_error = str(e).replace("\r\n", " ").replace("\n", " ").replace("\r", " ")
@@ -553,58 +729,115 @@ class SecurityService:
 
         return None, None
 
+    def _fetch_geolocation(self, path: str) -> dict[str, Any] | None:
+        """GET a path from ip-api.com, reusing this thread's keep-alive connection."""
+        try:
+            return self._geolocation_request(path)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server dropped the idle connection; retry once on a fresh one
+            return self._geolocation_request(path)
+
+    def _geolocation_request(self, path: str) -> dict[str, Any] | None:
+        """Send one request on the thread's ip-api.com connection.
+
+        Returns None for non-200 responses and bodies that aren't a JSON object.
+        """
+        conn: http.client.HTTPConnection | None = getattr(self._local, "geo_http", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(GEOLOCATION_API_HOST, timeout=5)
+            self._local.geo_http = conn
+        try:
+            conn.request("GET", path, headers={"User-Agent": "Eclosion/1.0"})
+            resp = conn.getresponse()
+            # Always drain the body so the keep-alive connection can be reused
+            body = resp.read()
+        except Exception:
+            # Closed connections reopen on the next request
+            conn.close()
+            raise
+        if resp.status != 200:
+            logger.debug("[Geolocation] HTTP %s from %s", resp.status, GEOLOCATION_API_HOST)
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
     def _get_cached_geolocation(self, ip_address: str) -> tuple[str | None, str | None] | None:
-        """Get cached geolocation for an IP address."""
+        """Get cached geolocation for an IP address, checking memory before the database."""
+        with self._geo_memory_lock:
+            entry = self._geo_memory.get(ip_address)
+            if entry is not None:
+                if time.monotonic() < entry[0]:
+                    self._geo_memory.move_to_end(ip_address)
+                    return entry[1]
+                del self._geo_memory[ip_address]
+
         try:
-            conn = self._get_connection()
-            cursor = conn.execute(
-                "SELECT country, city, cached_at FROM ip_geolocation_cache WHERE ip_address = ?",
-                (ip_address,),
-            )
-            row = cursor.fetchone()
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT country, city, cached_at FROM ip_geolocation_cache "
+                    "WHERE ip_address = ?",
+                    (ip_address,),
+                ).fetchone()
             if row:
-                # Check if cache is still valid (7 days)
+                # Check if cache is still valid
                 cached_at = datetime.fromisoformat(row["cached_at"])
-                if datetime.now(UTC) - cached_at < timedelta(days=7):
-                    return row["country"], row["city"]
+                remaining = GEOLOCATION_CACHE_TTL - (datetime.now(UTC) - cached_at)
+                if remaining > timedelta(0):
+                    location = (row["country"], row["city"])
+                    self._remember_geolocation(ip_address, location, remaining)
+                    return location
         except Exception:
             pass
         return None
 
+    def _remember_geolocation(
+        self, ip_address: str, location: tuple[str | None, str | None], ttl: timedelta
+    ) -> None:
+        """Keep a geolocation in the bounded in-memory cache."""
+        with self._geo_memory_lock:
+            self._geo_memory[ip_address] = (time.monotonic() + ttl.total_seconds(), location)
+            self._geo_memory.move_to_end(ip_address)
+            if len(self._geo_memory) > GEOLOCATION_MEMORY_CACHE_SIZE:
+                self._geo_memory.popitem(last=False)
+
     def _cache_geolocation(self, ip_address: str, country: str | None, city: str | None) -> None:
         """Cache geolocation for an IP address."""
         try:
-            conn = self._get_connection()
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO ip_geolocation_cache (ip_address, country, city, cached_at)
-                VALUES (?, ?, ?, ?)
-                """,
-                (ip_address, country, city, datetime.now(UTC).isoformat()),
-            )
-            conn.commit()
+            with self._connection() as conn, conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO ip_geolocation_cache
+                    (ip_address, country, city, cached_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (ip_address, country, city, datetime.now(UTC).isoformat()),
+                )
         except Exception as e:
             logger.warning("Failed to cache geolocation: %s", e)
+        self._remember_geolocation(ip_address, (country, city), GEOLOCATION_CACHE_TTL)
 
     def _get_preference(self, key: str) -> str | None:
         """Get a security preference value."""
+        if key in self._preference_cache:
+            return self._preference_cache[key]
         try:
-            conn = self._get_connection()
-            cursor = conn.execute("SELECT value FROM security_preferences WHERE key = ?", (key,))
-            row = cursor.fetchone()
-            return row["value"] if row else None
+            with self._connection() as conn:
+                row = conn.execute(GET_PREFERENCE_SQL, (key,)).fetchone()
         except Exception:
             return None
+        value = row["value"] if row else None
+        self._preference_cache[key] = value
+        return value
 
     def _set_preference(self, key: str, value: str) -> None:
         """Set a security preference value."""
         try:
-            conn = self._get_connection()
-            conn.execute(
-                "INSERT OR REPLACE INTO security_preferences (key, value) VALUES (?, ?)",
-                (key, value),
-            )
-            conn.commit()
+            with self._connection() as conn, conn:
+                conn.execute(SET_PREFERENCE_SQL, (key, value))
+            self._preference_cache[key] = value
         except Exception as e:
             logger.warning("Failed to set security preference: %s", e)
 
@@ -623,17 +856,13 @@ class SecurityService:
             return False
 
         try:
-            conn = self._get_connection()
-            cursor = conn.execute(
-                "SELECT locked_until FROM ip_lockouts WHERE ip_address = ?",
-                (ip_address,),
-            )
-            row = cursor.fetchone()
+            with self._connection() as conn:
+                row = conn.execute(SELECT_LOCKED_UNTIL_SQL, (ip_address,)).fetchone()
             if not row or not row["locked_until"]:
                 return False
 
-            locked_until = datetime.fromisoformat(row["locked_until"])
-            if datetime.now(UTC) < locked_until:
+            # UTC ISO-8601 timestamps order the same as the instants they encode
+            if row["locked_until"] > datetime.now(UTC).isoformat():
                 return True
 
             # Lockout expired, clear it
@@ -653,46 +882,30 @@ class SecurityService:
             return False
 
         try:
-            conn = self._get_connection()
-            now = datetime.now(UTC).isoformat()
-
-            # Get current attempt count
-            cursor = conn.execute(
-                "SELECT failed_attempts FROM ip_lockouts WHERE ip_address = ?",
-                (ip_address,),
-            )
-            row = cursor.fetchone()
-            current_attempts = row["failed_attempts"] if row else 0
-            new_attempts = current_attempts + 1
-
-            # Check if we should lock out
-            locked_until = None
-            if new_attempts >= LOCKOUT_THRESHOLD:
-                locked_until = (
-                    datetime.now(UTC) + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
-                ).isoformat()
-                logger.warning(
-                    "IP %s locked out until %s after %d failed attempts",
-                    ip_address,
-                    locked_until,
-                    new_attempts,
-                )
+            now = datetime.now(UTC)
+            locked_until = (now + timedelta(minutes=LOCKOUT_DURATION_MINUTES)).isoformat()
+
+            with self._connection() as conn, conn:
+                attempts = conn.execute(
+                    RECORD_FAILED_ATTEMPT_SQL,
+                    {
+                        "ip": ip_address,
+                        "threshold": LOCKOUT_THRESHOLD,
+                        "locked_until": locked_until,
+                        "now": now.isoformat(),
+                    },
+                ).fetchone()[0]
+
+            if attempts < LOCKOUT_THRESHOLD:
+                return False
 
-            # Upsert the lockout record
-            conn.execute(
-                """
-                INSERT INTO ip_lockouts (ip_address, failed_attempts, locked_until, last_attempt)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(ip_address) DO UPDATE SET
-                    failed_attempts = ?,
-                    locked_until = ?,
-                    last_attempt = ?
-                """,
-                (ip_address, new_attempts, locked_until, now, new_attempts, locked_until, now),
+            logger.warning(
+                "IP %s locked out until %s after %d failed attempts",
+                ip_address,
+                locked_until,
+                attempts,
             )
-            conn.commit()
-
-            return new_attempts >= LOCKOUT_THRESHOLD
+            return True
         except Exception as e:
             logger.warning("Failed to record failed unlock attempt: %s", e)
             return False
@@ -710,9 +923,8 @@ class SecurityService:
     def _clear_ip_lockout(self, ip_address: str) -> None:
         """Internal method to clear lockout state."""
         try:
-            conn = self._get_connection()
-            conn.execute("DELETE FROM ip_lockouts WHERE ip_address = ?", (ip_address,))
-            conn.commit()
+            with self._connection() as conn, conn:
+                conn.execute("DELETE FROM ip_lockouts WHERE ip_address = ?", (ip_address,))
         except Exception as e:
             logger.warning("Failed to clear IP lockout: %s", e)
 
@@ -726,12 +938,8 @@ class SecurityService:
             return 0
 
         try:
-            conn = self._get_connection()
-            cursor = conn.execute(
-                "SELECT locked_until FROM ip_lockouts WHERE ip_address = ?",
-                (ip_address,),
-            )
-            row = cursor.fetchone()
+            with self._connection() as conn:
+                row = conn.execute(SELECT_LOCKED_UNTIL_SQL, (ip_address,)).fetchone()
             if not row or not row["locked_until"]:
                 return 0
 
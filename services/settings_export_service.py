@@ -835,15 +835,7 @@ class SettingsExportService:
         # Import matches (skip duplicates for same original_transaction_id)
         for match in refunds_data.get("matches", []):
             try:
-                existing = repo.get_refunds_match_by_original(match["original_transaction_id"])
-                if existing:
-                    warnings.append(
-                        f"Skipped match for transaction {match['original_transaction_id']}: "
-                        "already exists"
-                    )
-                    continue
-
-                repo.create_refunds_match(
+                created = repo.create_refunds_match(
                     original_transaction_id=match["original_transaction_id"],
                     refund_transaction_id=match.get("refund_transaction_id"),
                     refund_amount=match.get("refund_amount"),
@@ -861,6 +853,12 @@ class SettingsExportService:
                     if match.get("transaction_data")
                     else None,
                 )
+                if not created:
+                    warnings.append(
+                        f"Skipped match for transaction {match['original_transaction_id']}: "
+                        "already exists"
+                    )
+                    continue
                 imported["matches"] += 1
             except Exception as e:
                 warnings.append(f"Failed to import refund match: {e}")
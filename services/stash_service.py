@@ -78,11 +78,10 @@ def round_monthly_rate(rate: float) -> int:
     """
     Round monthly rate using standard rounding with minimum of $1.
 
-    This matches the frontend calculation logic exactly.
+    This matches the frontend calculation logic exactly: halves round up
+    like Math.round, rather than to even like Python's round().
     """
-    if rate <= 0:
-        return 0
-    return max(1, round(rate))
+    return max(1, int(rate + 0.5)) if rate > 0 else 0
 
 
 def months_between(start_date: str, end_date: str) -> int:
@@ -2127,7 +2126,7 @@ class StashService:
         """
         from calendar import monthrange
 
-        from dateutil.relativedelta import relativedelta  # type: ignore[import-untyped]
+        from dateutil.relativedelta import relativedelta
 
         items_data = self._get_active_stash_items_for_history()
         if not items_data:
@@ -55,6 +55,11 @@ class SyncService:
         self.scheduler.set_full_sync_callback(self._background_full_sync)
         self.scheduler.set_ifttt_sync_callback(self._check_ifttt_events)
 
+    def _mark_sync_complete(self) -> None:
+        """Persist the sync timestamp and let the scheduler skip redundant ticks."""
+        self.state_manager.mark_sync_complete()
+        self.scheduler.record_sync_complete()
+
     # Credential management - delegated to CredentialsService
     def has_stored_credentials(self) -> bool:
         """Check if encrypted credentials exist on disk."""
@@ -631,7 +636,7 @@ class SyncService:
             # and update last_sync to show the app is working
             try:
                 await self.recurring_service.get_all_recurring()
-                self.state_manager.mark_sync_complete()
+                self._mark_sync_complete()
                 return {
                     "success": True,
                     "message": "Connected to Monarch. Configure Recurring to start syncing.",
@@ -751,7 +756,7 @@ class SyncService:
                 auto_categorize_result = {"error": str(e)}
 
         # Step 6: Mark sync complete
-        self.state_manager.mark_sync_complete()
+        self._mark_sync_complete()
 
         results: dict[str, Any] = {
             "success": True,
@@ -1304,7 +1309,7 @@ class SyncService:
             await self.category_manager.get_all_category_balances()
 
             # Mark sync complete
-            self.state_manager.mark_sync_complete()
+            self._mark_sync_complete()
 
             # Check for goal achievements and push IFTTT trigger events (non-blocking)
             try:
@@ -1377,7 +1382,7 @@ class SyncService:
             # doesn't see "Never synced" after their first login, while not
             # interfering with the rate limit check in full_sync().
             if data_fetched and state.last_sync is None:
-                self.state_manager.mark_sync_complete()
+                self._mark_sync_complete()
                 state = self.state_manager.load()  # Reload to get updated last_sync
 
             return {
@@ -1604,17 +1609,21 @@ class SyncService:
 
     # Background sync callback
 
-    async def _background_full_sync(self) -> None:
+    async def _background_full_sync(self) -> bool:
         """
         Run full sync as a background scheduled task.
 
         Catches RateLimitError gracefully (user may have just synced manually).
+        Returns False if the sync failed, so the scheduler can back off.
         """
         from core.exceptions import RateLimitError
 
         try:
-            await self.full_sync()
+            result = await self.full_sync()
         except RateLimitError:
             logger.debug("Background sync skipped — rate limited")
+            return True
         except Exception as e:
             logger.error(f"Background full sync failed: {e}")
+            return False
+        return bool(result.get("success", True))
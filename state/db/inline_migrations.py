@@ -12,9 +12,9 @@ How to add a new migration:
 Migrations are idempotent - they only run if DB version < migration version.
 """
 
+import contextlib
 import logging
 import sqlite3
-from datetime import UTC, datetime
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -22,13 +22,37 @@ logger = logging.getLogger(__name__)
 # Current schema version - bump when adding migrations
 SCHEMA_VERSION = 24
 
+# Connection settings for an upgrade run. WAL matches the app's engine;
+# foreign keys stay off so table rebuilds (DROP + RENAME) don't cascade.
+MIGRATION_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA foreign_keys=OFF;
+"""
+
 
 def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
     """Check if a column exists in a table."""
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table})")
-    columns = [row[1] for row in cursor.fetchall()]
-    return column in columns
+    row = conn.execute(
+        "SELECT 1 FROM pragma_table_info(?) WHERE name = ?", (table, column)
+    ).fetchone()
+    return row is not None
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, coldef: str) -> None:
+    """
+    Add a column to a table, doing nothing if it already exists.
+
+    SQLite has no ADD COLUMN IF NOT EXISTS, so the ALTER is attempted and
+    the duplicate column error swallowed.
+    """
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {coldef}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e).lower():
+            raise
 
 
 def migrate_v3_frozen_target(conn: sqlite3.Connection) -> None:
@@ -41,18 +65,14 @@ def migrate_v3_frozen_target(conn: sqlite3.Connection) -> None:
     This is a Python function instead of raw SQL to handle the case where
     columns may already exist (SQLite doesn't support ADD COLUMN IF NOT EXISTS).
     """
-    cursor = conn.cursor()
-
     # Add columns only if they don't exist
-    if not column_exists(conn, "categories", "frozen_rollover_amount"):
-        cursor.execute("ALTER TABLE categories ADD COLUMN frozen_rollover_amount FLOAT")
+    add_column_if_missing(conn, "categories", "frozen_rollover_amount FLOAT")
 
-    if not column_exists(conn, "categories", "frozen_next_due_date"):
-        cursor.execute("ALTER TABLE categories ADD COLUMN frozen_next_due_date VARCHAR(20)")
+    add_column_if_missing(conn, "categories", "frozen_next_due_date VARCHAR(20)")
 
     # Clear all existing frozen targets to force recalculation
     # This fixes the rollup proportion bug and applies new balance model
-    cursor.execute("""
+    conn.execute("""
         UPDATE categories SET
             frozen_monthly_target = NULL,
             target_month = NULL,
@@ -63,8 +83,6 @@ def migrate_v3_frozen_target(conn: sqlite3.Connection) -> None:
             frozen_next_due_date = NULL
     """)
 
-    conn.commit()
-
 
 def migrate_v4_wishlist_subtract_spending(conn: sqlite3.Connection) -> None:
     """
@@ -74,12 +92,7 @@ def migrate_v4_wishlist_subtract_spending(conn: sqlite3.Connection) -> None:
     - False (default): progress = rollover + budgeted (spending doesn't reduce progress)
     - True: progress = remaining (spending reduces progress)
     """
-    if not column_exists(conn, "wishlist_items", "subtract_spending"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE wishlist_items ADD COLUMN subtract_spending BOOLEAN NOT NULL DEFAULT 0"
-        )
-        conn.commit()
+    add_column_if_missing(conn, "wishlist_items", "subtract_spending BOOLEAN NOT NULL DEFAULT 0")
 
 
 def migrate_v5_wishlist_goal_type(conn: sqlite3.Connection) -> None:
@@ -96,31 +109,23 @@ def migrate_v5_wishlist_goal_type(conn: sqlite3.Connection) -> None:
     - completed_at: When a one-time purchase was marked as done
     - tracking_start_date: Custom start date for aggregate queries
     """
-    cursor = conn.cursor()
-
     # Add goal_type column (default 'one_time')
-    if not column_exists(conn, "wishlist_items", "goal_type"):
-        cursor.execute(
-            "ALTER TABLE wishlist_items "
-            "ADD COLUMN goal_type VARCHAR(20) NOT NULL DEFAULT 'one_time'"
-        )
+    add_column_if_missing(
+        conn, "wishlist_items", "goal_type VARCHAR(20) NOT NULL DEFAULT 'one_time'"
+    )
 
     # Add completed_at column
-    if not column_exists(conn, "wishlist_items", "completed_at"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN completed_at DATETIME")
+    add_column_if_missing(conn, "wishlist_items", "completed_at DATETIME")
 
     # Add tracking_start_date column
-    if not column_exists(conn, "wishlist_items", "tracking_start_date"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN tracking_start_date DATE")
+    add_column_if_missing(conn, "wishlist_items", "tracking_start_date DATE")
 
     # Migrate existing subtract_spending=true to goal_type='savings_buffer'
     if column_exists(conn, "wishlist_items", "subtract_spending"):
-        cursor.execute(
+        conn.execute(
             "UPDATE wishlist_items SET goal_type = 'savings_buffer' WHERE subtract_spending = 1"
         )
 
-    conn.commit()
-
     # Note: We don't drop subtract_spending here because SQLite < 3.35 doesn't support DROP COLUMN.
     # The column will remain but be unused. The model simply won't map to it.
 
@@ -133,25 +138,13 @@ def migrate_v6_stash_sort_order(conn: sqlite3.Connection) -> None:
     - wishlist_items: For stash item reordering
     - monarch_goal_layout: For Monarch goal reordering
     """
-    cursor = conn.cursor()
-
     # Add sort_order to wishlist_items
-    if not column_exists(conn, "wishlist_items", "sort_order"):
-        cursor.execute(
-            "ALTER TABLE wishlist_items ADD COLUMN sort_order INTEGER NOT NULL DEFAULT 0"
-        )
+    add_column_if_missing(conn, "wishlist_items", "sort_order INTEGER NOT NULL DEFAULT 0")
 
-    # Add sort_order to monarch_goal_layout (if table exists)
-    try:
-        if not column_exists(conn, "monarch_goal_layout", "sort_order"):
-            cursor.execute(
-                "ALTER TABLE monarch_goal_layout ADD COLUMN sort_order INTEGER NOT NULL DEFAULT 0"
-            )
-    except sqlite3.OperationalError:
-        # Table may not exist if Monarch goals feature hasn't been used
-        pass
-
-    conn.commit()
+    # Add sort_order to monarch_goal_layout (if table exists).
+    # Table may not exist if Monarch goals feature hasn't been used.
+    with contextlib.suppress(sqlite3.OperationalError):
+        add_column_if_missing(conn, "monarch_goal_layout", "sort_order INTEGER NOT NULL DEFAULT 0")
 
 
 def migrate_v7_credentials_notes_key(conn: sqlite3.Connection) -> None:
@@ -161,10 +154,7 @@ def migrate_v7_credentials_notes_key(conn: sqlite3.Connection) -> None:
     Stores the desktop's notes encryption key encrypted with the user's passphrase.
     This allows tunnel/remote users to decrypt notes created by the desktop app.
     """
-    if not column_exists(conn, "credentials", "notes_key_encrypted"):
-        cursor = conn.cursor()
-        cursor.execute("ALTER TABLE credentials ADD COLUMN notes_key_encrypted TEXT")
-        conn.commit()
+    add_column_if_missing(conn, "credentials", "notes_key_encrypted TEXT")
 
 
 def migrate_v8_wishlist_items_grid_layout(conn: sqlite3.Connection) -> None:
@@ -174,20 +164,11 @@ def migrate_v8_wishlist_items_grid_layout(conn: sqlite3.Connection) -> None:
     Adds grid_x, grid_y, col_span, row_span for widget-style resizable cards,
     and image_attribution for Openverse image credits.
     """
-    cursor = conn.cursor()
-
-    if not column_exists(conn, "wishlist_items", "grid_x"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN grid_x INTEGER NOT NULL DEFAULT 0")
-    if not column_exists(conn, "wishlist_items", "grid_y"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN grid_y INTEGER NOT NULL DEFAULT 0")
-    if not column_exists(conn, "wishlist_items", "col_span"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN col_span INTEGER NOT NULL DEFAULT 1")
-    if not column_exists(conn, "wishlist_items", "row_span"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN row_span INTEGER NOT NULL DEFAULT 1")
-    if not column_exists(conn, "wishlist_items", "image_attribution"):
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN image_attribution TEXT")
-
-    conn.commit()
+    add_column_if_missing(conn, "wishlist_items", "grid_x INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "wishlist_items", "grid_y INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "wishlist_items", "col_span INTEGER NOT NULL DEFAULT 1")
+    add_column_if_missing(conn, "wishlist_items", "row_span INTEGER NOT NULL DEFAULT 1")
+    add_column_if_missing(conn, "wishlist_items", "image_attribution TEXT")
 
 
 def migrate_v9_wishlist_config_stash_settings(conn: sqlite3.Connection) -> None:
@@ -197,25 +178,12 @@ def migrate_v9_wishlist_config_stash_settings(conn: sqlite3.Connection) -> None:
     Adds include_expected_income, show_monarch_goals, selected_cash_account_ids,
     and buffer_amount for the Available to Stash calculation.
     """
-    cursor = conn.cursor()
-
-    if not column_exists(conn, "wishlist_config", "include_expected_income"):
-        cursor.execute(
-            "ALTER TABLE wishlist_config ADD COLUMN include_expected_income "
-            "BOOLEAN NOT NULL DEFAULT 1"
-        )
-    if not column_exists(conn, "wishlist_config", "show_monarch_goals"):
-        cursor.execute(
-            "ALTER TABLE wishlist_config ADD COLUMN show_monarch_goals BOOLEAN NOT NULL DEFAULT 1"
-        )
-    if not column_exists(conn, "wishlist_config", "selected_cash_account_ids"):
-        cursor.execute("ALTER TABLE wishlist_config ADD COLUMN selected_cash_account_ids TEXT")
-    if not column_exists(conn, "wishlist_config", "buffer_amount"):
-        cursor.execute(
-            "ALTER TABLE wishlist_config ADD COLUMN buffer_amount INTEGER NOT NULL DEFAULT 0"
-        )
-
-    conn.commit()
+    add_column_if_missing(
+        conn, "wishlist_config", "include_expected_income BOOLEAN NOT NULL DEFAULT 1"
+    )
+    add_column_if_missing(conn, "wishlist_config", "show_monarch_goals BOOLEAN NOT NULL DEFAULT 1")
+    add_column_if_missing(conn, "wishlist_config", "selected_cash_account_ids TEXT")
+    add_column_if_missing(conn, "wishlist_config", "buffer_amount INTEGER NOT NULL DEFAULT 0")
 
 
 def migrate_v10_monarch_goal_layout_table(conn: sqlite3.Connection) -> None:
@@ -225,16 +193,14 @@ def migrate_v10_monarch_goal_layout_table(conn: sqlite3.Connection) -> None:
     This table stores grid positions for Monarch savings goals displayed in Stash.
     May already exist from create_all(), but older DBs might not have it.
     """
-    cursor = conn.cursor()
-
     # Check if table exists
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT name FROM sqlite_master
         WHERE type='table' AND name='monarch_goal_layout'
     """)
 
     if not cursor.fetchone():
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE monarch_goal_layout (
                 goal_id VARCHAR(100) PRIMARY KEY,
                 grid_x INTEGER NOT NULL DEFAULT 0,
@@ -246,7 +212,6 @@ def migrate_v10_monarch_goal_layout_table(conn: sqlite3.Connection) -> None:
                 updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        conn.commit()
 
 
 def migrate_v11_stash_hypotheses_extended(conn: sqlite3.Connection) -> None:
@@ -256,10 +221,8 @@ def migrate_v11_stash_hypotheses_extended(conn: sqlite3.Connection) -> None:
     Adds custom_available_funds, custom_left_to_budget, and item_apys
     for full scenario persistence in hypothesize mode.
     """
-    cursor = conn.cursor()
-
     # Check if table exists first (may not exist if user never used hypotheses)
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT name FROM sqlite_master
         WHERE type='table' AND name='stash_hypotheses'
     """)
@@ -268,16 +231,9 @@ def migrate_v11_stash_hypotheses_extended(conn: sqlite3.Connection) -> None:
         # Table doesn't exist - create_all() will handle it
         return
 
-    if not column_exists(conn, "stash_hypotheses", "custom_available_funds"):
-        cursor.execute("ALTER TABLE stash_hypotheses ADD COLUMN custom_available_funds FLOAT")
-    if not column_exists(conn, "stash_hypotheses", "custom_left_to_budget"):
-        cursor.execute("ALTER TABLE stash_hypotheses ADD COLUMN custom_left_to_budget FLOAT")
-    if not column_exists(conn, "stash_hypotheses", "item_apys"):
-        cursor.execute(
-            "ALTER TABLE stash_hypotheses ADD COLUMN item_apys TEXT NOT NULL DEFAULT '{}'"
-        )
-
-    conn.commit()
+    add_column_if_missing(conn, "stash_hypotheses", "custom_available_funds FLOAT")
+    add_column_if_missing(conn, "stash_hypotheses", "custom_left_to_budget FLOAT")
+    add_column_if_missing(conn, "stash_hypotheses", "item_apys TEXT NOT NULL DEFAULT '{}'")
 
 
 def migrate_v12_wishlist_custom_image_path(conn: sqlite3.Connection) -> None:
@@ -286,10 +242,7 @@ def migrate_v12_wishlist_custom_image_path(conn: sqlite3.Connection) -> None:
 
     Stores user-uploaded images or Openverse URLs for stash item cards.
     """
-    if not column_exists(conn, "wishlist_items", "custom_image_path"):
-        cursor = conn.cursor()
-        cursor.execute("ALTER TABLE wishlist_items ADD COLUMN custom_image_path TEXT")
-        conn.commit()
+    add_column_if_missing(conn, "wishlist_items", "custom_image_path TEXT")
 
 
 def migrate_v13_wishlist_config_folder_names(conn: sqlite3.Connection) -> None:
@@ -298,10 +251,7 @@ def migrate_v13_wishlist_config_folder_names(conn: sqlite3.Connection) -> None:
 
     Stores JSON array of folder names for filtering stash items.
     """
-    if not column_exists(conn, "wishlist_config", "selected_folder_names"):
-        cursor = conn.cursor()
-        cursor.execute("ALTER TABLE wishlist_config ADD COLUMN selected_folder_names TEXT")
-        conn.commit()
+    add_column_if_missing(conn, "wishlist_config", "selected_folder_names TEXT")
 
 
 def migrate_v15_acknowledgements(conn: sqlite3.Connection) -> None:
@@ -311,32 +261,13 @@ def migrate_v15_acknowledgements(conn: sqlite3.Connection) -> None:
     Moves tour completion, news article read state, and stash intro
     from client-side localStorage to server-side database storage.
     """
-    cursor = conn.cursor()
-
-    if not column_exists(conn, "tracker_config", "seen_stash_tour"):
-        cursor.execute(
-            "ALTER TABLE tracker_config ADD COLUMN seen_stash_tour BOOLEAN NOT NULL DEFAULT 0"
-        )
-    if not column_exists(conn, "tracker_config", "seen_notes_tour"):
-        cursor.execute(
-            "ALTER TABLE tracker_config ADD COLUMN seen_notes_tour BOOLEAN NOT NULL DEFAULT 0"
-        )
-    if not column_exists(conn, "tracker_config", "seen_recurring_tour"):
-        cursor.execute(
-            "ALTER TABLE tracker_config ADD COLUMN seen_recurring_tour BOOLEAN NOT NULL DEFAULT 0"
-        )
-    if not column_exists(conn, "tracker_config", "seen_stash_intro"):
-        cursor.execute(
-            "ALTER TABLE tracker_config ADD COLUMN seen_stash_intro BOOLEAN NOT NULL DEFAULT 0"
-        )
-    if not column_exists(conn, "tracker_config", "read_update_ids"):
-        cursor.execute("ALTER TABLE tracker_config ADD COLUMN read_update_ids TEXT")
-    if not column_exists(conn, "tracker_config", "updates_install_date"):
-        cursor.execute("ALTER TABLE tracker_config ADD COLUMN updates_install_date VARCHAR(50)")
-    if not column_exists(conn, "tracker_config", "updates_last_viewed_at"):
-        cursor.execute("ALTER TABLE tracker_config ADD COLUMN updates_last_viewed_at VARCHAR(50)")
-
-    conn.commit()
+    add_column_if_missing(conn, "tracker_config", "seen_stash_tour BOOLEAN NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "tracker_config", "seen_notes_tour BOOLEAN NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "tracker_config", "seen_recurring_tour BOOLEAN NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "tracker_config", "seen_stash_intro BOOLEAN NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "tracker_config", "read_update_ids TEXT")
+    add_column_if_missing(conn, "tracker_config", "updates_install_date VARCHAR(50)")
+    add_column_if_missing(conn, "tracker_config", "updates_last_viewed_at VARCHAR(50)")
 
 
 def migrate_v14_wishlist_nullable_amount_date(conn: sqlite3.Connection) -> None:
@@ -348,10 +279,8 @@ def migrate_v14_wishlist_nullable_amount_date(conn: sqlite3.Connection) -> None:
 
     SQLite doesn't support ALTER COLUMN, so we recreate the table with the new schema.
     """
-    cursor = conn.cursor()
-
     # Check current table structure - if columns are already nullable, skip
-    cursor.execute("PRAGMA table_info(wishlist_items)")
+    cursor = conn.execute("PRAGMA table_info(wishlist_items)")
     columns = {row[1]: row for row in cursor.fetchall()}
 
     # Column info: (cid, name, type, notnull, default, pk)
@@ -367,7 +296,7 @@ def migrate_v14_wishlist_nullable_amount_date(conn: sqlite3.Connection) -> None:
     col_names = [col[1] for col in columns.values()]
 
     # Create new table with nullable columns
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE wishlist_items_new (
             id VARCHAR(36) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
@@ -433,15 +362,13 @@ def migrate_v14_wishlist_nullable_amount_date(conn: sqlite3.Connection) -> None:
     ]
     cols_str = ", ".join(copy_cols)
 
-    cursor.execute(
+    conn.execute(
         f"INSERT INTO wishlist_items_new ({cols_str}) SELECT {cols_str} FROM wishlist_items"
     )
 
     # Drop old table and rename new one
-    cursor.execute("DROP TABLE wishlist_items")
-    cursor.execute("ALTER TABLE wishlist_items_new RENAME TO wishlist_items")
-
-    conn.commit()
+    conn.execute("DROP TABLE wishlist_items")
+    conn.execute("ALTER TABLE wishlist_items_new RENAME TO wishlist_items")
 
 
 def migrate_v16_refundables(conn: sqlite3.Connection) -> None:
@@ -451,15 +378,13 @@ def migrate_v16_refundables(conn: sqlite3.Connection) -> None:
     Adds refundables_config (single-row settings), refundables_saved_views
     (tag-filtered tabs), and refundables_matches (refund match tracking).
     """
-    cursor = conn.cursor()
-
     # Create refundables_config table
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT name FROM sqlite_master
         WHERE type='table' AND name='refundables_config'
     """)
     if not cursor.fetchone():
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE refundables_config (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
                 replacement_tag_id VARCHAR(100),
@@ -470,12 +395,12 @@ def migrate_v16_refundables(conn: sqlite3.Connection) -> None:
         """)
 
     # Create refundables_saved_views table
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT name FROM sqlite_master
         WHERE type='table' AND name='refundables_saved_views'
     """)
     if not cursor.fetchone():
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE refundables_saved_views (
                 id VARCHAR(36) PRIMARY KEY,
                 name VARCHAR(255) NOT NULL,
@@ -487,12 +412,12 @@ def migrate_v16_refundables(conn: sqlite3.Connection) -> None:
         """)
 
     # Create refundables_matches table
-    cursor.execute("""
+    cursor = conn.execute("""
         SELECT name FROM sqlite_master
         WHERE type='table' AND name='refundables_matches'
     """)
     if not cursor.fetchone():
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE refundables_matches (
                 id VARCHAR(36) PRIMARY KEY,
                 original_transaction_id VARCHAR(100) NOT NULL UNIQUE,
@@ -507,8 +432,6 @@ def migrate_v16_refundables(conn: sqlite3.Connection) -> None:
             )
         """)
 
-    conn.commit()
-
 
 def migrate_v17_refundables_category_ids(conn: sqlite3.Connection) -> None:
     """
@@ -517,10 +440,7 @@ def migrate_v17_refundables_category_ids(conn: sqlite3.Connection) -> None:
     Allows views to optionally filter by Monarch category IDs.
     NULL means "all categories" (no category filter).
     """
-    if not column_exists(conn, "refundables_saved_views", "category_ids"):
-        cursor = conn.cursor()
-        cursor.execute("ALTER TABLE refundables_saved_views ADD COLUMN category_ids TEXT")
-        conn.commit()
+    add_column_if_missing(conn, "refundables_saved_views", "category_ids TEXT")
 
 
 def migrate_v18_refundables_transaction_data(conn: sqlite3.Connection) -> None:
@@ -530,10 +450,7 @@ def migrate_v18_refundables_transaction_data(conn: sqlite3.Connection) -> None:
     Stores a JSON snapshot of the transaction at match time, so matched
     transactions remain visible even after their tags are removed.
     """
-    if not column_exists(conn, "refundables_matches", "transaction_data"):
-        cursor = conn.cursor()
-        cursor.execute("ALTER TABLE refundables_matches ADD COLUMN transaction_data TEXT")
-        conn.commit()
+    add_column_if_missing(conn, "refundables_matches", "transaction_data TEXT")
 
 
 def migrate_v19_refundables_aging_warning_days(conn: sqlite3.Connection) -> None:
@@ -543,13 +460,9 @@ def migrate_v19_refundables_aging_warning_days(conn: sqlite3.Connection) -> None
     Configurable threshold (in days) for highlighting old unmatched
     transactions with an orange-to-red color gradient. Default 30 days.
     """
-    if not column_exists(conn, "refundables_config", "aging_warning_days"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE refundables_config "
-            "ADD COLUMN aging_warning_days INTEGER NOT NULL DEFAULT 30"
-        )
-        conn.commit()
+    add_column_if_missing(
+        conn, "refundables_config", "aging_warning_days INTEGER NOT NULL DEFAULT 30"
+    )
 
 
 def migrate_v21_refundables_expected_refund(conn: sqlite3.Connection) -> None:
@@ -559,26 +472,12 @@ def migrate_v21_refundables_expected_refund(conn: sqlite3.Connection) -> None:
     Supports the "Expected Refund" feature: users can mark transactions
     with an expected refund date, account, amount, and note.
     """
-    cursor = conn.cursor()
-
-    if not column_exists(conn, "refundables_matches", "expected_refund"):
-        cursor.execute(
-            "ALTER TABLE refundables_matches ADD COLUMN expected_refund BOOLEAN NOT NULL DEFAULT 0"
-        )
-    if not column_exists(conn, "refundables_matches", "expected_date"):
-        cursor.execute("ALTER TABLE refundables_matches ADD COLUMN expected_date VARCHAR(20)")
-    if not column_exists(conn, "refundables_matches", "expected_account"):
-        cursor.execute("ALTER TABLE refundables_matches ADD COLUMN expected_account VARCHAR(255)")
-    if not column_exists(conn, "refundables_matches", "expected_account_id"):
-        cursor.execute(
-            "ALTER TABLE refundables_matches ADD COLUMN expected_account_id VARCHAR(100)"
-        )
-    if not column_exists(conn, "refundables_matches", "expected_note"):
-        cursor.execute("ALTER TABLE refundables_matches ADD COLUMN expected_note TEXT")
-    if not column_exists(conn, "refundables_matches", "expected_amount"):
-        cursor.execute("ALTER TABLE refundables_matches ADD COLUMN expected_amount FLOAT")
-
-    conn.commit()
+    add_column_if_missing(conn, "refundables_matches", "expected_refund BOOLEAN NOT NULL DEFAULT 0")
+    add_column_if_missing(conn, "refundables_matches", "expected_date VARCHAR(20)")
+    add_column_if_missing(conn, "refundables_matches", "expected_account VARCHAR(255)")
+    add_column_if_missing(conn, "refundables_matches", "expected_account_id VARCHAR(100)")
+    add_column_if_missing(conn, "refundables_matches", "expected_note TEXT")
+    add_column_if_missing(conn, "refundables_matches", "expected_amount FLOAT")
 
 
 def migrate_v22_rename_refundables_to_refunds(conn: sqlite3.Connection) -> None:
@@ -588,8 +487,6 @@ def migrate_v22_rename_refundables_to_refunds(conn: sqlite3.Connection) -> None:
     Renames refundables_config → refunds_config, refundables_saved_views →
     refunds_saved_views, refundables_matches → refunds_matches.
     """
-    cursor = conn.cursor()
-
     table_renames = [
         ("refundables_config", "refunds_config"),
         ("refundables_saved_views", "refunds_saved_views"),
@@ -598,14 +495,12 @@ def migrate_v22_rename_refundables_to_refunds(conn: sqlite3.Connection) -> None:
 
     for old_name, new_name in table_renames:
         # Check if old table exists (may already be renamed)
-        cursor.execute(
+        cursor = conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
             (old_name,),
         )
         if cursor.fetchone():
-            cursor.execute(f"ALTER TABLE {old_name} RENAME TO {new_name}")
-
-    conn.commit()
+            conn.execute(f"ALTER TABLE {old_name} RENAME TO {new_name}")
 
 
 def migrate_v20_refundables_show_badge(conn: sqlite3.Connection) -> None:
@@ -615,12 +510,7 @@ def migrate_v20_refundables_show_badge(conn: sqlite3.Connection) -> None:
     Toggle for showing the pending transaction count badge in the
     sidebar navigation. Default enabled (true).
     """
-    if not column_exists(conn, "refundables_config", "show_badge"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE refundables_config ADD COLUMN show_badge BOOLEAN NOT NULL DEFAULT 1"
-        )
-        conn.commit()
+    add_column_if_missing(conn, "refundables_config", "show_badge BOOLEAN NOT NULL DEFAULT 1")
 
 
 def migrate_v23_refunds_hide_transactions(conn: sqlite3.Connection) -> None:
@@ -630,21 +520,13 @@ def migrate_v23_refunds_hide_transactions(conn: sqlite3.Connection) -> None:
     Settings to hide matched/expected transactions from the transaction list.
     Both default to false (show all transactions).
     """
-    if not column_exists(conn, "refunds_config", "hide_matched_transactions"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE refunds_config "
-            "ADD COLUMN hide_matched_transactions BOOLEAN NOT NULL DEFAULT 0"
-        )
-        conn.commit()
+    add_column_if_missing(
+        conn, "refunds_config", "hide_matched_transactions BOOLEAN NOT NULL DEFAULT 0"
+    )
 
-    if not column_exists(conn, "refunds_config", "hide_expected_transactions"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE refunds_config "
-            "ADD COLUMN hide_expected_transactions BOOLEAN NOT NULL DEFAULT 0"
-        )
-        conn.commit()
+    add_column_if_missing(
+        conn, "refunds_config", "hide_expected_transactions BOOLEAN NOT NULL DEFAULT 0"
+    )
 
 
 def migrate_v24_refunds_exclude_from_all(conn: sqlite3.Connection) -> None:
@@ -654,12 +536,9 @@ def migrate_v24_refunds_exclude_from_all(conn: sqlite3.Connection) -> None:
     Per-view toggle to exclude a view's transactions from the aggregated
     All tab. Default false (included in All tab).
     """
-    if not column_exists(conn, "refunds_saved_views", "exclude_from_all"):
-        cursor = conn.cursor()
-        cursor.execute(
-            "ALTER TABLE refunds_saved_views ADD COLUMN exclude_from_all BOOLEAN NOT NULL DEFAULT 0"
-        )
-        conn.commit()
+    add_column_if_missing(
+        conn, "refunds_saved_views", "exclude_from_all BOOLEAN NOT NULL DEFAULT 0"
+    )
 
 
 # Migration definitions
@@ -859,63 +738,88 @@ MIGRATIONS = [
     },
 ]
 
+# Ordered once at import so run_migrations only has to slice off the pending tail
+_MIGRATIONS_SORTED = sorted(MIGRATIONS, key=lambda m: m["version"])  # type: ignore[arg-type, return-value]
+
+if _MIGRATIONS_SORTED[-1]["version"] != SCHEMA_VERSION:
+    raise RuntimeError(
+        f"SCHEMA_VERSION ({SCHEMA_VERSION}) does not match the latest migration "
+        f"(v{_MIGRATIONS_SORTED[-1]['version']})"
+    )
+
+
+def _split_sql_script(script: str) -> list[str]:
+    """Split a SQL script into individual statements."""
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement)
+            statement = ""
+    return statements
+
 
 def get_schema_version(conn: sqlite3.Connection) -> int:
-    """Get current schema version from database."""
-    cursor = conn.cursor()
+    """
+    Get current schema version from database.
 
-    # Check if schema_version table exists
-    cursor.execute("""
-        SELECT name FROM sqlite_master
-        WHERE type='table' AND name='schema_version'
-    """)
+    The version lives in the file header (PRAGMA user_version). Databases last
+    migrated by older builds only have it in the schema_version table, which
+    is read but left in place.
+    """
+    version: int = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version:
+        return version
 
-    if not cursor.fetchone():
-        # Table doesn't exist - check if this is a fresh DB or legacy
-        cursor.execute("""
+    # One sqlite_master lookup tells a legacy versioned DB from an
+    # unversioned one and from a fresh file
+    tables = {
+        row[0]
+        for row in conn.execute("""
             SELECT name FROM sqlite_master
-            WHERE type='table' AND name='notes'
+            WHERE type='table' AND name IN ('schema_version', 'notes')
         """)
-        if cursor.fetchone():
-            # Has tables but no version tracking - legacy DB at version 1
-            return 1
-        else:
-            # Fresh database
-            return 0
-
-    # Get version from table
-    cursor.execute("SELECT version FROM schema_version LIMIT 1")
-    row = cursor.fetchone()
+    }
+
+    if "schema_version" not in tables:
+        # Has tables but no version tracking - legacy DB at version 1;
+        # otherwise a fresh database
+        return 1 if "notes" in tables else 0
+
+    row = conn.execute("SELECT version FROM schema_version LIMIT 1").fetchone()
     return row[0] if row else 0
 
 
 def set_schema_version(conn: sqlite3.Connection, version: int) -> None:
-    """Set schema version in database."""
-    cursor = conn.cursor()
+    """
+    Set schema version in database.
 
-    # Ensure table exists
-    cursor.execute("""
+    Writes user_version and mirrors it into the schema_version table, which is
+    what older builds read; without it a downgraded app would see a legacy v1
+    database and replay every migration. Both writes are transactional, so
+    inside a transaction they only take effect when the caller commits.
+    """
+    # PRAGMA doesn't accept bound parameters
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS schema_version (
             id INTEGER PRIMARY KEY CHECK (id = 1),
             version INTEGER NOT NULL,
             updated_at DATETIME NOT NULL
         )
     """)
-
-    # Upsert version
-    cursor.execute(
+    conn.execute(
         """
         INSERT INTO schema_version (id, version, updated_at)
-        VALUES (1, ?, ?)
+        VALUES (1, ?, CURRENT_TIMESTAMP)
         ON CONFLICT(id) DO UPDATE SET
             version = excluded.version,
             updated_at = excluded.updated_at
-    """,
-        (version, datetime.now(UTC).isoformat()),
+        """,
+        (version,),
     )
 
-    conn.commit()
-
 
 def run_migrations(db_path: Path) -> None:
     """
@@ -928,7 +832,8 @@ def run_migrations(db_path: Path) -> None:
         logger.info("Database does not exist yet, skipping migrations")
         return
 
-    conn = sqlite3.connect(db_path)
+    # Autocommit mode: the transaction is managed explicitly below
+    conn = sqlite3.connect(db_path, isolation_level=None)
     try:
         current_version = get_schema_version(conn)
         logger.info(f"Current schema version: {current_version}, target: {SCHEMA_VERSION}")
@@ -937,13 +842,15 @@ def run_migrations(db_path: Path) -> None:
             logger.info("Database is up to date")
             return
 
-        # Run each migration in order
-        for migration in MIGRATIONS:
-            version: int = migration["version"]  # type: ignore[assignment]
+        conn.executescript(MIGRATION_PRAGMAS)
 
-            if current_version >= version:
-                continue  # Already applied
+        # Apply every pending migration in one transaction, so the upgrade
+        # commits once and a failure leaves the database at its old version
+        conn.execute("BEGIN IMMEDIATE")
 
+        pending = [m for m in _MIGRATIONS_SORTED if m["version"] > current_version]  # type: ignore[operator]
+        for migration in pending:
+            version: int = migration["version"]  # type: ignore[assignment]
             description: str = migration["description"]  # type: ignore[assignment]
             sql: str | None = migration["sql"]  # type: ignore[assignment]
 
@@ -954,18 +861,26 @@ def run_migrations(db_path: Path) -> None:
                     # Execute migration function
                     sql(conn)
                 else:
-                    # Execute migration SQL script
-                    cursor = conn.cursor()
-                    cursor.executescript(sql)
-                    conn.commit()
+                    # Execute migration SQL script statement by statement;
+                    # executescript() would commit the open transaction first
+                    for statement in _split_sql_script(sql):
+                        conn.execute(statement)
 
-            # Update version after each successful migration
-            set_schema_version(conn, version)
             logger.info(f"Migration v{version} complete")
 
+        set_schema_version(conn, SCHEMA_VERSION)
+        conn.commit()
         logger.info(f"All migrations complete. Schema version: {SCHEMA_VERSION}")
 
+        # Only reached after an upgrade, so the up-to-date path stays cheap
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            logger.warning(f"Integrity check after migration reported: {integrity}")
+        conn.execute("PRAGMA optimize")
+
     except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
         logger.error(f"Migration failed: {e}")
         raise
     finally:
@@ -977,6 +892,6 @@ def ensure_schema_current(db_path: Path) -> None:
     Ensure database schema is current.
 
     This is the main entry point called from init_db().
-    Creates schema_version table if needed and runs pending migrations.
+    Runs any migrations newer than the version recorded in the database.
     """
     run_migrations(db_path)
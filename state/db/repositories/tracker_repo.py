@@ -4,7 +4,10 @@ Tracker state repository.
 
 import uuid
 from datetime import UTC, datetime
+from typing import Any, cast
 
+from sqlalchemy import CursorResult
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from state.db.models import (
@@ -211,6 +214,27 @@ class TrackerRepository:
             return True
         return False
 
+    def clear_frozen_targets(self, recurring_ids: list[str]) -> int:
+        """Clear frozen targets for several categories in one UPDATE."""
+        if not recurring_ids:
+            return 0
+        return (
+            self.session.query(Category)
+            .filter(Category.recurring_id.in_(recurring_ids))
+            .update(
+                {
+                    Category.frozen_monthly_target: None,
+                    Category.target_month: None,
+                    Category.balance_at_month_start: None,
+                    Category.frozen_amount: None,
+                    Category.frozen_frequency_months: None,
+                    Category.frozen_rollover_amount: None,
+                    Category.frozen_next_due_date: None,
+                },
+                synchronize_session=False,
+            )
+        )
+
     # === Rollup ===
 
     def get_rollup(self) -> Rollup:
@@ -1064,13 +1088,14 @@ class TrackerRepository:
         """Get all refund matches."""
         return self.session.query(RefundsMatch).order_by(RefundsMatch.created_at.desc()).all()
 
-    def get_refunds_match_by_original(self, original_transaction_id: str) -> RefundsMatch | None:
-        """Get a match by original transaction ID."""
-        return (
-            self.session.query(RefundsMatch)
-            .filter(RefundsMatch.original_transaction_id == original_transaction_id)
-            .first()
-        )
+    def get_matched_original_ids(self) -> set[str]:
+        """Get the original transaction IDs of all matches, without loading the rows."""
+        rows = self.session.query(RefundsMatch.original_transaction_id).all()
+        return {row[0] for row in rows}
+
+    def get_refunds_match(self, match_id: str) -> RefundsMatch | None:
+        """Get a match by ID."""
+        return self.session.get(RefundsMatch, match_id)
 
     def create_refunds_match(
         self,
@@ -1088,29 +1113,38 @@ class TrackerRepository:
         expected_note: str | None = None,
         expected_amount: float | None = None,
         transaction_data: str | None = None,
-    ) -> RefundsMatch:
-        """Create a new refund match."""
-        match = RefundsMatch(
-            id=str(uuid.uuid4()),
-            original_transaction_id=original_transaction_id,
-            refund_transaction_id=refund_transaction_id,
-            refund_amount=refund_amount,
-            refund_merchant=refund_merchant,
-            refund_date=refund_date,
-            refund_account=refund_account,
-            skipped=skipped,
-            expected_refund=expected_refund,
-            expected_date=expected_date,
-            expected_account=expected_account,
-            expected_account_id=expected_account_id,
-            expected_note=expected_note,
-            expected_amount=expected_amount,
-            transaction_data=transaction_data,
-            created_at=datetime.now(UTC),
-            updated_at=datetime.now(UTC),
+    ) -> bool:
+        """Create a new refund match unless the original transaction is already matched.
+
+        Relies on the unique original_transaction_id index, so the duplicate
+        check and insert are a single statement. Returns True if a row was added.
+        """
+        now = datetime.now(UTC)
+        stmt = (
+            sqlite_insert(RefundsMatch)
+            .values(
+                id=str(uuid.uuid4()),
+                original_transaction_id=original_transaction_id,
+                refund_transaction_id=refund_transaction_id,
+                refund_amount=refund_amount,
+                refund_merchant=refund_merchant,
+                refund_date=refund_date,
+                refund_account=refund_account,
+                skipped=skipped,
+                expected_refund=expected_refund,
+                expected_date=expected_date,
+                expected_account=expected_account,
+                expected_account_id=expected_account_id,
+                expected_note=expected_note,
+                expected_amount=expected_amount,
+                transaction_data=transaction_data,
+                created_at=now,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=[RefundsMatch.original_transaction_id])
         )
-        self.session.add(match)
-        return match
+        result = cast(CursorResult[Any], self.session.execute(stmt))
+        return bool(result.rowcount > 0)
 
     def delete_refunds_match(self, match_id: str) -> bool:
         """Delete a refund match by ID."""
@@ -387,6 +387,13 @@ class StateManager:
             repo = TrackerRepository(session)
             repo.mark_sync_complete()
 
+    def get_last_sync_epoch(self) -> float | None:
+        """Get last sync time as epoch seconds without loading full state."""
+        with db_session() as session:
+            repo = TrackerRepository(session)
+            last_sync = repo.get_config().last_sync
+            return last_sync.replace(tzinfo=UTC).timestamp() if last_sync else None
+
     def set_user_first_name(self, first_name: str) -> None:
         """Update user's first name from Monarch profile."""
         with db_session() as session:
@@ -556,6 +563,12 @@ class StateManager:
             repo = TrackerRepository(session)
             return repo.clear_frozen_target(recurring_id)
 
+    def clear_frozen_targets(self, recurring_ids: list[str]) -> int:
+        """Clear frozen targets for several items in a single transaction."""
+        with db_session() as session:
+            repo = TrackerRepository(session)
+            return repo.clear_frozen_targets(recurring_ids)
+
     # === Removed item notice methods ===
 
     def add_removed_notice(
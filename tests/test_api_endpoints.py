@@ -3,6 +3,8 @@ Tests for Flask API security headers.
 
 Tests cover:
 - Security headers on responses
+- orjson JSON provider parity
+- Per-app service resolution in blueprints
 
 Note: Full API integration tests require proper Flask test configuration.
 These tests focus on security headers which can be tested in isolation.
@@ -102,3 +104,76 @@ class TestHealthEndpoint:
         data = response.get_json()
         assert data is not None
         assert data.get("status") == "ok"
+
+
+class TestJsonProvider:
+    """Tests for the orjson-backed JSON provider."""
+
+    def test_matches_default_provider_output(self) -> None:
+        """Should serialize the same as Flask's stdlib provider."""
+        from datetime import UTC, datetime
+        from decimal import Decimal
+
+        from flask.json.provider import DefaultJSONProvider
+
+        payload = {
+            "b": [1, 2.5, None, True],
+            "a": {"nested": "héllo"},
+            "when": datetime(2025, 1, 2, 3, 4, 5, tzinfo=UTC),
+            "amount": Decimal("1.50"),
+        }
+        expected = DefaultJSONProvider(app).loads(DefaultJSONProvider(app).dumps(payload))
+        assert app.json.loads(app.json.dumps(payload)) == expected
+
+    def test_known_differences_from_default_provider(self) -> None:
+        """Should emit raw UTF-8 and null for non-finite floats, unlike stdlib."""
+        assert app.json.dumps({"a": "héllo"}) == '{"a":"héllo"}'
+        assert app.json.dumps({"n": float("nan"), "i": float("inf")}) == '{"i":null,"n":null}'
+
+    def test_falls_back_for_large_integers(self) -> None:
+        """Should fall back to stdlib for integers orjson can't encode."""
+        assert app.json.dumps({"n": 2**70}) == '{"n": 1180591620717411303424}'
+
+    def test_response_is_json(self) -> None:
+        """Responses should keep the application/json mimetype."""
+        with app.app_context():
+            response = app.json.response({"ok": True})
+        assert response.mimetype == "application/json"
+        assert response.get_json() == {"ok": True}
+
+    def test_response_accepts_jsonify_call_forms(self) -> None:
+        """Should build the body from kwargs or several args, as jsonify does."""
+        with app.app_context():
+            assert app.json.response(ok=True).get_json() == {"ok": True}
+            assert app.json.response(1, 2).get_json() == [1, 2]
+            assert app.json.response().get_json() is None
+            with pytest.raises(TypeError):
+                app.json.response(1, ok=True)
+
+
+class TestBlueprintServices:
+    """Tests for resolving services from the current app."""
+
+    def test_notes_services_follow_current_app(self) -> None:
+        """Should resolve the notes services from whichever app is active."""
+        from unittest.mock import MagicMock
+
+        from flask import Flask
+
+        from blueprints import Services, get_services, init_services
+
+        apps = []
+        for _ in range(2):
+            test_app = Flask(__name__)
+            services = Services(
+                sync_service=MagicMock(),
+                security_service=MagicMock(),
+                notes_manager=MagicMock(),
+            )
+            init_services(test_app, services)
+            apps.append((test_app, services))
+
+        for test_app, services in apps:
+            with test_app.app_context():
+                assert get_services().notes_manager is services.notes_manager
+                assert get_services().sync_service is services.sync_service
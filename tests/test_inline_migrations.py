@@ -0,0 +1,290 @@
+"""
+Tests for the inline (packaged app) database migrations.
+
+Tests cover:
+- Reading and writing the schema version
+- Upgrading databases that track the version in a table
+- Running only pending migrations
+- Idempotent column additions
+"""
+
+import sqlite3
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from state.db import inline_migrations
+from state.db.inline_migrations import (
+    SCHEMA_VERSION,
+    add_column_if_missing,
+    column_exists,
+    get_schema_version,
+    run_migrations,
+    set_schema_version,
+)
+
+
+@pytest.fixture
+def conn(use_test_database: Path) -> Generator[sqlite3.Connection, None, None]:
+    """Open a raw connection to the test database (full current schema)."""
+    connection = sqlite3.connect(use_test_database)
+    yield connection
+    connection.close()
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+class TestSchemaVersion:
+    """Tests for schema version storage."""
+
+    def test_fresh_database_is_version_zero(self, tmp_path: Path) -> None:
+        """Should report 0 for an empty database."""
+        connection = sqlite3.connect(tmp_path / "empty.db")
+
+        assert get_schema_version(connection) == 0
+        connection.close()
+
+    def test_unversioned_database_is_legacy(self, conn: sqlite3.Connection) -> None:
+        """Should treat a database with tables but no version as version 1."""
+        assert get_schema_version(conn) == 1
+
+    def test_round_trips_through_user_version(self, conn: sqlite3.Connection) -> None:
+        """Should store the version in the file header and the legacy table."""
+        set_schema_version(conn, 7)
+        conn.commit()
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+        assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == 7
+        assert get_schema_version(conn) == 7
+
+    def test_reads_legacy_version_table(self, conn: sqlite3.Connection) -> None:
+        """Should read a schema_version table without modifying it."""
+        conn.execute(
+            "CREATE TABLE schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, "
+            "updated_at DATETIME NOT NULL)"
+        )
+        conn.execute("INSERT INTO schema_version VALUES (1, 12, '2025-01-01T00:00:00')")
+        conn.commit()
+
+        assert get_schema_version(conn) == 12
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert _table_exists(conn, "schema_version")
+
+
+class TestRunMigrations:
+    """Tests for applying pending migrations."""
+
+    def test_missing_database_is_skipped(self, tmp_path: Path) -> None:
+        """Should not create a database file."""
+        db_path = tmp_path / "missing.db"
+
+        run_migrations(db_path)
+
+        assert not db_path.exists()
+
+    def test_current_database_is_untouched(
+        self, conn: sqlite3.Connection, use_test_database: Path
+    ) -> None:
+        """Should not change a database that is already current."""
+        set_schema_version(conn, SCHEMA_VERSION)
+        conn.commit()
+
+        run_migrations(use_test_database)
+
+        assert get_schema_version(conn) == SCHEMA_VERSION
+
+    def test_applies_pending_migrations(
+        self, conn: sqlite3.Connection, use_test_database: Path
+    ) -> None:
+        """Should run migrations newer than the stored version and record the target."""
+        set_schema_version(conn, SCHEMA_VERSION - 1)
+        conn.commit()
+
+        run_migrations(use_test_database)
+
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        # Older builds only read the table
+        assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == SCHEMA_VERSION
+
+    def test_failed_upgrade_keeps_legacy_version_table(
+        self,
+        conn: sqlite3.Connection,
+        use_test_database: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Should leave a legacy schema_version table intact when an upgrade fails."""
+        conn.execute(
+            "CREATE TABLE schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, "
+            "updated_at DATETIME NOT NULL)"
+        )
+        conn.execute("INSERT INTO schema_version VALUES (1, 2, '2025-01-01T00:00:00')")
+        conn.commit()
+
+        def fail(c: sqlite3.Connection) -> None:
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(
+            inline_migrations,
+            "_MIGRATIONS_SORTED",
+            [{"version": 3, "description": "fail", "sql": fail}],
+        )
+        monkeypatch.setattr(inline_migrations, "SCHEMA_VERSION", 3)
+
+        with pytest.raises(RuntimeError):
+            run_migrations(use_test_database)
+
+        assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == 2
+        assert get_schema_version(conn) == 2
+
+    def test_upgrade_switches_database_to_wal(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Should put the database in WAL mode before migrating."""
+        db_path = tmp_path / "legacy.db"
+        connection = sqlite3.connect(db_path)
+        connection.execute("CREATE TABLE notes (id INTEGER)")
+        connection.commit()
+        connection.close()
+        monkeypatch.setattr(
+            inline_migrations,
+            "_MIGRATIONS_SORTED",
+            [{"version": 2, "description": "noop", "sql": "SELECT 1;"}],
+        )
+        monkeypatch.setattr(inline_migrations, "SCHEMA_VERSION", 2)
+
+        run_migrations(db_path)
+
+        connection = sqlite3.connect(db_path)
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert get_schema_version(connection) == 2
+        connection.close()
+
+    def test_upgrade_logs_failed_integrity_check(
+        self,
+        conn: sqlite3.Connection,
+        use_test_database: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        """Should warn when the post-upgrade integrity check is not ok."""
+
+        class FakeCursor:
+            def fetchone(self) -> tuple[str]:
+                return ("row 1 missing from index",)
+
+        real_connect = sqlite3.connect
+
+        class CheckedConnection(sqlite3.Connection):
+            def execute(self, sql: str, *args):
+                if sql == "PRAGMA integrity_check":
+                    return FakeCursor()
+                return super().execute(sql, *args)
+
+        monkeypatch.setattr(
+            inline_migrations.sqlite3,
+            "connect",
+            lambda *a, **kw: real_connect(*a, factory=CheckedConnection, **kw),
+        )
+        set_schema_version(conn, SCHEMA_VERSION - 1)
+        conn.commit()
+
+        run_migrations(use_test_database)
+
+        assert "row 1 missing from index" in caplog.text
+
+    def test_failed_migration_rolls_back_everything(
+        self,
+        conn: sqlite3.Connection,
+        use_test_database: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Should leave neither schema changes nor a version bump behind on failure."""
+
+        def add_table(c: sqlite3.Connection) -> None:
+            c.execute("CREATE TABLE migration_probe (id INTEGER)")
+
+        def fail(c: sqlite3.Connection) -> None:
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(
+            inline_migrations,
+            "_MIGRATIONS_SORTED",
+            [
+                {"version": 2, "description": "probe", "sql": add_table},
+                {"version": 3, "description": "fail", "sql": fail},
+            ],
+        )
+        monkeypatch.setattr(inline_migrations, "SCHEMA_VERSION", 3)
+
+        with pytest.raises(RuntimeError):
+            run_migrations(use_test_database)
+
+        assert get_schema_version(conn) == 1
+        assert not _table_exists(conn, "migration_probe")
+
+    def test_script_migrations_share_the_transaction(
+        self,
+        conn: sqlite3.Connection,
+        use_test_database: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Should not let a SQL script commit the batch early."""
+
+        def fail(c: sqlite3.Connection) -> None:
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(
+            inline_migrations,
+            "_MIGRATIONS_SORTED",
+            [
+                {"version": 2, "description": "probe", "sql": "CREATE TABLE probe (id INTEGER);"},
+                {"version": 3, "description": "fail", "sql": fail},
+            ],
+        )
+        monkeypatch.setattr(inline_migrations, "SCHEMA_VERSION", 3)
+
+        with pytest.raises(RuntimeError):
+            run_migrations(use_test_database)
+
+        assert not _table_exists(conn, "probe")
+
+
+class TestColumnExists:
+    """Tests for the column lookup helper."""
+
+    def test_finds_existing_column(self, conn: sqlite3.Connection) -> None:
+        """Should report columns the table has."""
+        assert column_exists(conn, "notes", "id")
+
+    def test_missing_column_or_table(self, conn: sqlite3.Connection) -> None:
+        """Should report False for unknown columns and tables."""
+        assert not column_exists(conn, "notes", "no_such_column")
+        assert not column_exists(conn, "no_such_table", "id")
+
+
+class TestAddColumnIfMissing:
+    """Tests for the idempotent ADD COLUMN helper."""
+
+    def test_adds_missing_column(self, conn: sqlite3.Connection) -> None:
+        """Should add the column when it isn't there yet."""
+        add_column_if_missing(conn, "notes", "probe_column TEXT")
+
+        assert column_exists(conn, "notes", "probe_column")
+
+    def test_existing_column_is_noop(self, conn: sqlite3.Connection) -> None:
+        """Should not raise when the column already exists."""
+        add_column_if_missing(conn, "notes", "probe_column TEXT")
+        add_column_if_missing(conn, "notes", "probe_column TEXT")
+
+        assert column_exists(conn, "notes", "probe_column")
+
+    def test_other_errors_propagate(self, conn: sqlite3.Connection) -> None:
+        """Should re-raise errors other than a duplicate column."""
+        with pytest.raises(sqlite3.OperationalError, match="no such table"):
+            add_column_if_missing(conn, "missing_table", "probe_column TEXT")
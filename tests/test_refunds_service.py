@@ -0,0 +1,517 @@
+"""
+Tests for the Refunds Service helpers.
+
+Tests cover:
+- Parsing and caching saved view filters
+- Per-view and global unmatched counts
+- Stripping and building Eclosion note blocks
+- Deleting matches and restoring Monarch tags/notes
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import Generator
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services import refunds_service
+from services.credentials_service import CredentialsService
+from services.refunds_service import (
+    RefundsService,
+    _append_note,
+    _build_expected_refund_note,
+    _build_refund_note,
+    _compute_view_counts,
+    _format_note_date,
+    _load_view_filter,
+    _parse_view_filters,
+    _strip_refund_notes,
+)
+
+
+def make_view(
+    view_id: str = "view-1",
+    tag_ids: list[str] | None = None,
+    category_ids: list[str] | None = None,
+    exclude_from_all: bool = False,
+    updated_at: datetime | None = None,
+) -> SimpleNamespace:
+    """Build a stand-in for a RefundsSavedView row."""
+    return SimpleNamespace(
+        id=view_id,
+        tag_ids=json.dumps(tag_ids or []),
+        category_ids=json.dumps(category_ids) if category_ids else None,
+        exclude_from_all=exclude_from_all,
+        updated_at=updated_at or datetime(2026, 1, 1, tzinfo=UTC),
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_view_filter_cache() -> Generator[None, None, None]:
+    refunds_service._VIEW_FILTER_CACHE.clear()
+    yield
+    refunds_service._VIEW_FILTER_CACHE.clear()
+
+
+class TestViewFilterCache:
+    """Tests for parsing saved view filters once per edit."""
+
+    def test_parses_tag_and_category_ids(self) -> None:
+        """Should decode both JSON columns."""
+        view = make_view(tag_ids=["t1", "t2"], category_ids=["c1"])
+
+        assert _load_view_filter(view) == (["t1", "t2"], ["c1"])
+
+    def test_reuses_parsed_filters(self) -> None:
+        """Should not decode JSON again for an unchanged view."""
+        view = make_view(tag_ids=["t1"])
+        _load_view_filter(view)
+
+        with patch.object(refunds_service.orjson, "loads") as loads:
+            _load_view_filter(view)
+
+        loads.assert_not_called()
+
+    def test_edit_invalidates_cache(self) -> None:
+        """Should re-parse when the view's updated_at changes."""
+        _load_view_filter(make_view(tag_ids=["t1"]))
+
+        edited = make_view(tag_ids=["t2"], updated_at=datetime(2026, 2, 1, tzinfo=UTC))
+
+        assert _load_view_filter(edited) == (["t2"], None)
+
+    def test_parse_view_filters_returns_sets(self) -> None:
+        """Should return frozen tag/category sets per view."""
+        views = [
+            make_view("a", tag_ids=["t1", "t2"], exclude_from_all=True),
+            make_view("b", tag_ids=["t3"], category_ids=["c1"]),
+        ]
+
+        assert _parse_view_filters(views) == [
+            ("a", frozenset({"t1", "t2"}), None, True),
+            ("b", frozenset({"t3"}), frozenset({"c1"}), False),
+        ]
+
+
+def make_txn(txn_id: str, tag_ids: list[str], category_id: str | None = None) -> dict:
+    """Build a Monarch transaction dict with tags and an optional category."""
+    return {
+        "id": txn_id,
+        "amount": -10.0,
+        "tags": [{"id": tag_id} for tag_id in tag_ids],
+        "category": {"id": category_id} if category_id else None,
+    }
+
+
+class TestComputeViewCounts:
+    """Tests for counting unmatched transactions per saved view."""
+
+    def test_counts_transactions_by_tag(self) -> None:
+        """Should count each transaction under every view sharing a tag."""
+        filters = _parse_view_filters(
+            [make_view("a", tag_ids=["t1"]), make_view("b", tag_ids=["t2"])]
+        )
+        txns = [make_txn("x", ["t1"]), make_txn("y", ["t1", "t2"]), make_txn("z", ["t3"])]
+
+        result = _compute_view_counts(filters, txns)
+
+        assert result == {"count": 2, "viewCounts": {"a": 2, "b": 1}}
+
+    def test_counts_transaction_once_per_view(self) -> None:
+        """Should not double count a transaction carrying two of a view's tags."""
+        filters = _parse_view_filters([make_view("a", tag_ids=["t1", "t2"])])
+
+        result = _compute_view_counts(filters, [make_txn("x", ["t1", "t2"])])
+
+        assert result == {"count": 1, "viewCounts": {"a": 1}}
+
+    def test_category_filter_matches_on_category(self) -> None:
+        """Should match views with a category filter by category only."""
+        filters = _parse_view_filters([make_view("a", tag_ids=["t1"], category_ids=["c1"])])
+        txns = [
+            make_txn("in-cat", [], "c1"),
+            make_txn("tag-only", ["t1"], "c2"),
+            make_txn("no-cat", ["t1"]),
+        ]
+
+        result = _compute_view_counts(filters, txns)
+
+        assert result == {"count": 1, "viewCounts": {"a": 1}}
+
+    def test_excluded_views_do_not_add_to_global_count(self) -> None:
+        """Should leave excludeFromAll views out of the global count."""
+        filters = _parse_view_filters(
+            [
+                make_view("a", tag_ids=["t1"]),
+                make_view("b", tag_ids=["t2"], exclude_from_all=True),
+            ]
+        )
+        txns = [make_txn("x", ["t1"]), make_txn("y", ["t2"]), make_txn("z", ["t1", "t2"])]
+
+        result = _compute_view_counts(filters, txns)
+
+        assert result == {"count": 2, "viewCounts": {"a": 2, "b": 2}}
+
+    def test_views_without_matches_report_zero(self) -> None:
+        """Should include every view in viewCounts even with no matches."""
+        filters = _parse_view_filters([make_view("a", tag_ids=["t1"]), make_view("b")])
+
+        result = _compute_view_counts(filters, [])
+
+        assert result == {"count": 0, "viewCounts": {"a": 0, "b": 0}}
+
+
+class TestStripRefundNotes:
+    """Tests for removing Eclosion note blocks from Monarch notes."""
+
+    def test_removes_blocks_and_collapses_blank_lines(self) -> None:
+        """Should drop matched/expected blocks and the gaps they leave."""
+        notes = (
+            "Before\n\n── Refund Matched ──\n$5.00\n──────────\n\n\n"
+            "── Expected Refund ──\n$2.00\n──────────\nAfter"
+        )
+
+        assert _strip_refund_notes(notes) == "Before\n\nAfter"
+
+    def test_plain_notes_are_only_trimmed(self) -> None:
+        """Should leave notes without blocks unchanged apart from whitespace."""
+        assert _strip_refund_notes("  Receipt #12\nKeep box  ") == "Receipt #12\nKeep box"
+
+    def test_plain_notes_collapse_blank_lines(self) -> None:
+        """Should collapse runs of blank lines even without a block."""
+        assert _strip_refund_notes("a\n\n\n\nb") == "a\n\nb"
+
+
+class TestBuildNotes:
+    """Tests for the note blocks written to Monarch transactions."""
+
+    def test_refund_note_formats_date(self) -> None:
+        """Should render ISO dates as M/D/YYYY without zero padding."""
+        note = _build_refund_note(-12.5, "Acme &amp; Co", "2026-03-07", "Checking")
+
+        assert note == (
+            '── Refund Matched ──\n$12.50 from "Acme & Co" on 3/7/2026 via Checking\n──────────'
+        )
+
+    def test_expected_note_keeps_unparseable_date(self) -> None:
+        """Should pass non-ISO dates through unchanged."""
+        note = _build_expected_refund_note(20.0, "next week", None, "Return label sent")
+
+        assert note == (
+            "── Expected Refund ──\n$20.00 expected by next week\nReturn label sent\n──────────"
+        )
+
+    def test_note_date_accepts_unpadded_dates(self) -> None:
+        """Should parse single-digit months and days like the zero-padded form."""
+        assert _format_note_date("2024-1-5") == "1/5/2024"
+
+    def test_note_date_passes_other_iso_forms_through(self) -> None:
+        """Should only parse YYYY-MM-DD, not compact or week-based ISO dates."""
+        assert _format_note_date("20240115") == "20240115"
+        assert _format_note_date("2024-W03-1") == "2024-W03-1"
+
+    def test_append_note_to_plain_notes(self) -> None:
+        """Should append after trimmed plain notes."""
+        assert _append_note("  Receipt  ", "NOTE") == "Receipt\n\nNOTE"
+
+    def test_append_note_without_original(self) -> None:
+        """Should use the note block alone when there are no notes."""
+        assert _append_note(None, "NOTE") == "NOTE"
+        assert _append_note("", "NOTE") == "NOTE"
+
+    def test_append_note_replaces_old_block(self) -> None:
+        """Should decode entities and drop an earlier Eclosion block."""
+        original = "Tom &amp; Jerry\n── Expected Refund ──\n$1.00\n──────────"
+
+        assert _append_note(original, "NOTE") == "Tom & Jerry\n\nNOTE"
+
+
+@pytest.fixture
+def monarch() -> Generator[dict[str, AsyncMock], None, None]:
+    """Patch the Monarch calls made by RefundsService."""
+    names = (
+        "get_mm",
+        "get_transaction_notes",
+        "get_transaction_tags",
+        "get_transactions_with_icons",
+        "update_transaction_notes",
+        "set_transaction_tags",
+    )
+    mocks = {name: AsyncMock() for name in names}
+    with patch.multiple(refunds_service, **mocks):
+        yield mocks
+
+
+class TestConfigCache:
+    """Tests for short-lived caching of the refunds config."""
+
+    def test_repeat_reads_skip_database(self) -> None:
+        """Should serve a second read within the TTL from memory."""
+        service = RefundsService()
+        first = asyncio.run(service.get_config())
+
+        with patch.object(refunds_service, "db_session") as db_session:
+            second = asyncio.run(service.get_config())
+
+        db_session.assert_not_called()
+        assert second == first
+
+    def test_update_invalidates_cache(self) -> None:
+        """Should return the new value right after an update."""
+        service = RefundsService()
+        asyncio.run(service.get_config())
+
+        asyncio.run(service.update_config({"agingWarningDays": 12}))
+
+        assert asyncio.run(service.get_config())["agingWarningDays"] == 12
+
+    def test_expired_cache_rereads(self) -> None:
+        """Should hit the database again once the TTL has passed."""
+        service = RefundsService()
+        asyncio.run(service.get_config())
+
+        later = time.monotonic() + 60
+        with (
+            patch.object(refunds_service.time, "monotonic", return_value=later),
+            patch.object(refunds_service, "db_session", wraps=refunds_service.db_session) as db,
+        ):
+            asyncio.run(service.get_config())
+
+        db.assert_called_once()
+
+
+class TestMonarchClientCache:
+    """Tests for reusing the Monarch client across calls."""
+
+    @pytest.fixture
+    def credentials(self) -> Generator[dict[str, str], None, None]:
+        creds = {"email": "user@example.com"}
+        with patch.object(CredentialsService, "_session_credentials", creds):
+            yield creds
+
+    def test_reuses_client_for_same_session(
+        self, monarch: dict[str, AsyncMock], credentials: dict[str, str]
+    ) -> None:
+        """Should log in once for repeated calls in the same session."""
+        service = RefundsService()
+
+        asyncio.run(service.get_tags())
+        asyncio.run(service.get_tags())
+
+        monarch["get_mm"].assert_awaited_once()
+
+    def test_new_session_gets_new_client(
+        self, monarch: dict[str, AsyncMock], credentials: dict[str, str]
+    ) -> None:
+        """Should log in again when the session credentials change."""
+        service = RefundsService()
+        asyncio.run(service.get_tags())
+
+        with patch.object(CredentialsService, "_session_credentials", dict(credentials)):
+            asyncio.run(service.get_tags())
+
+        assert monarch["get_mm"].await_count == 2
+
+    def test_no_cache_without_session(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should not reuse a client when no session is unlocked."""
+        service = RefundsService()
+
+        with patch.object(CredentialsService, "_session_credentials", None):
+            asyncio.run(service.get_tags())
+            asyncio.run(service.get_tags())
+
+        assert monarch["get_mm"].await_count == 2
+
+    def test_failure_drops_client(
+        self, monarch: dict[str, AsyncMock], credentials: dict[str, str]
+    ) -> None:
+        """Should re-authenticate after a Monarch call fails."""
+        service = RefundsService()
+        asyncio.run(service.get_tags())
+
+        with (
+            patch.object(refunds_service, "get_transaction_tags", side_effect=RuntimeError),
+            pytest.raises(RuntimeError),
+        ):
+            asyncio.run(service.get_tags())
+        asyncio.run(service.get_tags())
+
+        assert monarch["get_mm"].await_count == 2
+
+    def test_failed_match_write_drops_client(
+        self, monarch: dict[str, AsyncMock], credentials: dict[str, str]
+    ) -> None:
+        """Should re-authenticate after a best-effort write hits an auth error."""
+        service = RefundsService()
+        monarch["update_transaction_notes"].side_effect = RuntimeError("401 Unauthorized")
+
+        result = asyncio.run(service.create_match("txn-1", refund_amount=5.0))
+        asyncio.run(service.get_tags())
+
+        assert result == {"success": True}
+        assert monarch["get_mm"].await_count == 2
+
+    def test_failed_restore_drops_client(
+        self, monarch: dict[str, AsyncMock], credentials: dict[str, str]
+    ) -> None:
+        """Should re-authenticate after restoring tags on delete fails."""
+        service = RefundsService()
+        asyncio.run(
+            service.create_match(
+                "txn-1", refund_amount=5.0, transaction_data={"tags": [{"id": "t1"}]}
+            )
+        )
+        match_id = asyncio.run(service.get_matches())[0]["id"]
+        monarch["set_transaction_tags"].side_effect = RuntimeError("401 Unauthorized")
+
+        asyncio.run(service.delete_match(match_id))
+        asyncio.run(service.get_tags())
+
+        assert monarch["get_mm"].await_count == 2
+
+
+class TestGetPendingCount:
+    """Tests for the pending refunds badge count."""
+
+    def test_merges_tag_and_category_fetches(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should union both fetches and skip matched or non-expense transactions."""
+        service = RefundsService()
+        asyncio.run(service.create_view("Tagged", ["t1"]))
+        asyncio.run(service.create_view("Category", ["t2"], category_ids=["c1"]))
+        asyncio.run(service.create_match("matched", skipped=True))
+
+        by_tag = [
+            make_txn("a", ["t1"]),
+            make_txn("both", ["t1"], "c1"),
+            make_txn("matched", ["t1"]),
+        ]
+        by_cat = [make_txn("both", ["t1"], "c1"), make_txn("b", [], "c1")]
+        income = {**make_txn("income", [], "c1"), "amount": 10.0}
+
+        async def fetch(mm, tag_ids=None, category_ids=None):
+            return by_tag if tag_ids else [*by_cat, income]
+
+        monarch["get_transactions_with_icons"].side_effect = fetch
+
+        result = asyncio.run(service.get_pending_count())
+
+        assert monarch["get_transactions_with_icons"].await_count == 2
+        assert result["count"] == 3
+        assert sorted(result["viewCounts"].values()) == [2, 2]
+
+
+class TestCreateMatch:
+    """Tests for creating refund matches."""
+
+    def test_updates_notes_and_tags_with_one_client(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should write the note and swap tags using a single Monarch client."""
+        service = RefundsService()
+        asyncio.run(service.update_config({"replacementTagId": "done"}))
+
+        result = asyncio.run(
+            service.create_match(
+                "txn-1",
+                refund_amount=5.0,
+                replace_tag=True,
+                original_tag_ids=["pending", "other"],
+                original_notes="Receipt",
+                view_tag_ids=["pending"],
+            )
+        )
+
+        assert result == {"success": True}
+        monarch["get_mm"].assert_awaited_once()
+        mm = monarch["get_mm"].return_value
+        monarch["set_transaction_tags"].assert_awaited_once_with(mm, "txn-1", ["other", "done"])
+        await_args = monarch["update_transaction_notes"].await_args
+        assert await_args is not None
+        notes = await_args.args[2]
+        assert notes.startswith("Receipt\n\n── Refund Matched ──\n$5.00")
+
+    def test_rejects_duplicate_match(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should refuse to match the same transaction twice."""
+        service = RefundsService()
+        asyncio.run(service.create_match("txn-1", skipped=True))
+
+        result = asyncio.run(service.create_match("txn-1", skipped=True))
+
+        assert result == {"success": False, "error": "Transaction already matched"}
+
+    def test_skipped_match_does_not_call_monarch(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should not connect to Monarch when there is nothing to update."""
+        asyncio.run(RefundsService().create_match("txn-1", skipped=True))
+
+        monarch["get_mm"].assert_not_called()
+
+
+class TestGetMatches:
+    """Tests for listing refund matches."""
+
+    def test_decodes_snapshot_once(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should return the stored snapshot without re-decoding unchanged rows."""
+        service = RefundsService()
+        snapshot = {"id": "txn-1", "tags": [{"id": "t1"}]}
+        asyncio.run(service.create_match("txn-1", skipped=True, transaction_data=snapshot))
+        asyncio.run(service.get_matches())
+
+        with patch.object(refunds_service.orjson, "loads") as loads:
+            matches = asyncio.run(service.get_matches())
+
+        loads.assert_not_called()
+        assert matches[0]["transactionData"] == snapshot
+
+
+class TestDeleteMatch:
+    """Tests for deleting refund matches."""
+
+    def test_missing_match(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should report a missing match without touching Monarch."""
+        result = asyncio.run(RefundsService().delete_match("no-such-id"))
+
+        assert result == {"success": False, "error": "Match not found"}
+        monarch["get_mm"].assert_not_called()
+
+    def test_deletes_match_and_restores_tags(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should delete the row, strip our note block, and restore tags."""
+        service = RefundsService()
+        asyncio.run(
+            service.create_match(
+                "txn-1",
+                refund_amount=5.0,
+                transaction_data={"tags": [{"id": "t1"}, {"id": "t2"}]},
+            )
+        )
+        match_id = asyncio.run(service.get_matches())[0]["id"]
+        monarch["update_transaction_notes"].reset_mock()
+        notes = "Receipt\n── Refund Matched ──\n$5.00\n──────────"
+        monarch["get_transaction_notes"].return_value = notes
+
+        result = asyncio.run(service.delete_match(match_id))
+
+        assert result == {"success": True}
+        assert asyncio.run(service.get_matches()) == []
+        mm = monarch["get_mm"].return_value
+        monarch["update_transaction_notes"].assert_awaited_once_with(mm, "txn-1", "Receipt")
+        monarch["set_transaction_tags"].assert_awaited_once_with(mm, "txn-1", ["t1", "t2"])
+
+    def test_tag_restore_survives_note_failure(self, monarch: dict[str, AsyncMock]) -> None:
+        """Should still restore tags when stripping notes fails."""
+        service = RefundsService()
+        asyncio.run(
+            service.create_match(
+                "txn-1", refund_amount=5.0, transaction_data={"tags": [{"id": "t1"}]}
+            )
+        )
+        match_id = asyncio.run(service.get_matches())[0]["id"]
+        monarch["get_transaction_notes"].side_effect = RuntimeError("Monarch down")
+
+        result = asyncio.run(service.delete_match(match_id))
+
+        assert result == {"success": True}
+        monarch["set_transaction_tags"].assert_awaited_once_with(
+            monarch["get_mm"].return_value, "txn-1", ["t1"]
+        )
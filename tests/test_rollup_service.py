@@ -97,6 +97,9 @@ class MockStateManager:
             return True
         return False
 
+    def clear_frozen_targets(self, recurring_ids):
+        return sum(self.clear_frozen_target(recurring_id) for recurring_id in recurring_ids)
+
 
 class MockCategoryManager:
     """Mock category manager for rollup tests."""
@@ -0,0 +1,444 @@
+"""
+Tests for the background SyncScheduler.
+
+Tests cover:
+- Running async callbacks on the persistent event loop
+- Choosing full vs IFTTT sync on each tick
+- Skipping IFTTT checks after a recent sync
+- Skipping jobs without session credentials
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Generator
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from core.scheduler import SyncScheduler
+
+
+@pytest.fixture
+def scheduler() -> Generator[SyncScheduler, None, None]:
+    """Create a fresh scheduler, bypassing the singleton."""
+    original = SyncScheduler._instance
+    SyncScheduler._instance = None
+    instance = SyncScheduler()
+    yield instance
+    instance.shutdown()
+    SyncScheduler._instance = original
+
+
+@pytest.fixture
+def has_session() -> Generator[None, None, None]:
+    """Pretend session credentials are available."""
+    with patch.object(SyncScheduler, "_has_session_credentials", return_value=True):
+        yield
+
+
+class TestEventLoop:
+    """Tests for the scheduler's persistent event loop."""
+
+    def test_callbacks_share_one_loop_thread(self, scheduler: SyncScheduler, has_session) -> None:
+        """Should run every callback on the same long-lived loop thread."""
+        threads: list[int] = []
+
+        async def callback() -> None:
+            threads.append(threading.get_ident())
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.set_ifttt_sync_callback(callback)
+        scheduler.start()
+
+        scheduler._run_full_sync_wrapper()
+        scheduler._run_full_sync_wrapper()
+
+        assert len(threads) == 2
+        assert threads[0] == threads[1]
+        assert scheduler._loop_thread is not None
+        assert threads[0] == scheduler._loop_thread.ident
+
+    def test_shutdown_stops_loop_thread(self, scheduler: SyncScheduler) -> None:
+        """Should stop the loop thread on shutdown."""
+        scheduler.start()
+        thread = scheduler._loop_thread
+        assert thread is not None and thread.is_alive()
+
+        scheduler.shutdown()
+
+        assert not thread.is_alive()
+        assert scheduler._loop is None
+
+    def test_callback_errors_are_logged_not_raised(
+        self,
+        scheduler: SyncScheduler,
+        has_session,
+        caplog: pytest.LogCaptureFixture,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Should log callback failures instead of raising so the job keeps running."""
+        # Alembic's fileConfig() in other tests disables loggers that already exist
+        monkeypatch.setattr(logging.getLogger("core.scheduler"), "disabled", False)
+        calls: list[str] = []
+
+        async def failing() -> None:
+            calls.append("ran")
+            raise RuntimeError("boom")
+
+        scheduler.set_full_sync_callback(failing)
+        scheduler.start()
+
+        with caplog.at_level(logging.ERROR, logger="core.scheduler"):
+            scheduler._run_full_sync_wrapper()
+
+        assert calls == ["ran"]
+        assert "Scheduled full sync failed: boom" in caplog.text
+
+    def test_shutdown_cancels_running_job(self, scheduler: SyncScheduler, has_session) -> None:
+        """Should cancel a job blocked on the loop and wait for it instead of hanging."""
+        started = threading.Event()
+        finished = threading.Event()
+
+        async def callback() -> None:
+            started.set()
+            await asyncio.Event().wait()
+
+        def tick() -> None:
+            scheduler._run_full_sync_wrapper()
+            finished.set()
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.start()
+        assert scheduler._scheduler is not None
+        scheduler._scheduler.modify_job(
+            SyncScheduler.SYNC_JOB_ID, func=tick, next_run_time=datetime.now(UTC)
+        )
+        assert started.wait(timeout=5)
+
+        scheduler.shutdown()
+
+        assert finished.is_set()
+        assert scheduler._consecutive_failures == 0
+        assert scheduler._loop is None
+
+    def test_callback_timeout_cancels_callback(self, scheduler: SyncScheduler, has_session) -> None:
+        """Should give up on a callback that outlives the timeout and count a failure."""
+        cancelled = threading.Event()
+
+        async def callback() -> None:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.start()
+
+        with patch.object(SyncScheduler, "_CALLBACK_TIMEOUT_SECONDS", 0.1):
+            scheduler._run_full_sync_wrapper()
+
+        assert cancelled.wait(timeout=5)
+        assert scheduler._consecutive_failures == 1
+
+
+class TestSingleton:
+    """Tests for singleton construction."""
+
+    def test_construction_returns_instance(self, scheduler: SyncScheduler) -> None:
+        """Should return the existing scheduler instead of a new one."""
+        assert SyncScheduler() is scheduler
+        assert SyncScheduler.get_instance() is scheduler
+
+    def test_reconstruction_keeps_state(self, scheduler: SyncScheduler) -> None:
+        """Should not reset callbacks when constructed again."""
+
+        async def callback() -> None:
+            pass
+
+        scheduler.set_full_sync_callback(callback)
+        SyncScheduler()
+
+        assert scheduler._full_sync_callback is callback
+
+
+class TestLazyStart:
+    """Tests for deferring APScheduler setup until start()."""
+
+    def test_no_scheduler_until_started(self, scheduler: SyncScheduler) -> None:
+        """Should not create the APScheduler instance or loop in __init__."""
+        assert scheduler._scheduler is None
+        assert scheduler._loop is None
+
+    def test_shutdown_without_start_is_noop(self, scheduler: SyncScheduler) -> None:
+        """Should allow shutdown before start."""
+        scheduler.shutdown()
+
+        assert scheduler._scheduler is None
+
+    def test_can_restart_after_shutdown(self, scheduler: SyncScheduler) -> None:
+        """Should create a fresh scheduler when started again."""
+        scheduler.start()
+        scheduler.shutdown()
+        scheduler.start()
+
+        assert scheduler._scheduler is not None
+        assert scheduler._scheduler.running
+
+
+class TestSyncTick:
+    """Tests for the single coalesced sync job."""
+
+    def test_registers_single_job(self, scheduler: SyncScheduler) -> None:
+        """Should register one interval job."""
+        scheduler.start()
+
+        assert scheduler._scheduler is not None
+        jobs = scheduler._scheduler.get_jobs()
+        assert [job.id for job in jobs] == [SyncScheduler.SYNC_JOB_ID]
+
+    def test_job_uses_capped_executor(self, scheduler: SyncScheduler) -> None:
+        """Should run the job on a single-worker pool with no overlap."""
+        scheduler.start()
+
+        assert scheduler._scheduler is not None
+        executor = scheduler._scheduler._lookup_executor("default")
+        assert executor._pool._max_workers == SyncScheduler._EXECUTOR_MAX_WORKERS
+        job = scheduler._scheduler.get_job(SyncScheduler.SYNC_JOB_ID)
+        assert job.max_instances == 1
+        assert job.coalesce is True
+
+    def test_runs_ifttt_before_full_sync_is_due(self, scheduler: SyncScheduler) -> None:
+        """Should run the IFTTT check when the last full sync was recent."""
+        scheduler._last_full_sync_monotonic = time.monotonic()
+
+        with (
+            patch.object(scheduler, "_run_full_sync_wrapper") as full,
+            patch.object(scheduler, "_run_ifttt_sync_wrapper") as ifttt,
+        ):
+            scheduler._run_sync_tick()
+
+        full.assert_not_called()
+        ifttt.assert_called_once()
+
+    def test_runs_full_sync_when_due(self, scheduler: SyncScheduler) -> None:
+        """Should run a full sync once the full interval has elapsed."""
+        interval = SyncScheduler.FULL_SYNC_INTERVAL_MINUTES * 60
+        scheduler._last_full_sync_monotonic = time.monotonic() - interval
+
+        with (
+            patch.object(scheduler, "_run_full_sync_wrapper") as full,
+            patch.object(scheduler, "_run_ifttt_sync_wrapper") as ifttt,
+        ):
+            scheduler._run_sync_tick()
+
+        full.assert_called_once()
+        ifttt.assert_not_called()
+        assert time.monotonic() - scheduler._last_full_sync_monotonic < 5
+
+
+class TestFailureBackoff:
+    """Tests for widening the tick interval after repeated failures."""
+
+    @pytest.fixture
+    def failing(self, scheduler: SyncScheduler, has_session) -> SyncScheduler:
+        async def callback() -> None:
+            raise RuntimeError("backend down")
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.start()
+        return scheduler
+
+    def _job_minutes(self, scheduler: SyncScheduler) -> float:
+        assert scheduler._scheduler is not None
+        job = scheduler._scheduler.get_job(SyncScheduler.SYNC_JOB_ID)
+        return float(job.trigger.interval.total_seconds()) / 60
+
+    def test_single_failure_keeps_interval(self, failing: SyncScheduler) -> None:
+        """Should not back off after one failure."""
+        failing._run_full_sync_wrapper()
+
+        assert self._job_minutes(failing) == SyncScheduler.IFTTT_SYNC_INTERVAL_MINUTES
+
+    def test_second_failure_backs_off_past_full_sync_interval(self, failing: SyncScheduler) -> None:
+        """Should widen the tick beyond the normal full sync cadence on the second failure."""
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+
+        assert self._job_minutes(failing) == SyncScheduler.FULL_SYNC_INTERVAL_MINUTES * 2
+
+    def test_repeated_failures_widen_interval(self, failing: SyncScheduler) -> None:
+        """Should double the interval per failure once backing off."""
+        base = SyncScheduler.FULL_SYNC_INTERVAL_MINUTES
+
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+        assert self._job_minutes(failing) == base * 4
+
+        failing._run_full_sync_wrapper()
+        assert self._job_minutes(failing) == base * 8
+
+    def test_backoff_is_capped(self, failing: SyncScheduler) -> None:
+        """Should never back off beyond once a day."""
+        for _ in range(10):
+            failing._run_full_sync_wrapper()
+
+        assert self._job_minutes(failing) == SyncScheduler._MAX_BACKOFF_MINUTES
+
+    def test_success_restores_interval(self, failing: SyncScheduler) -> None:
+        """Should return to the normal interval after a successful sync."""
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+
+        async def ok() -> None:
+            pass
+
+        failing.set_full_sync_callback(ok)
+        failing._run_full_sync_wrapper()
+
+        assert failing._consecutive_failures == 0
+        assert self._job_minutes(failing) == SyncScheduler.IFTTT_SYNC_INTERVAL_MINUTES
+
+    def test_false_result_counts_as_failure(self, failing: SyncScheduler) -> None:
+        """Should back off when the callback reports failure instead of raising."""
+
+        async def reports_failure() -> bool:
+            return False
+
+        failing.set_full_sync_callback(reports_failure)
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+
+        assert self._job_minutes(failing) == SyncScheduler.FULL_SYNC_INTERVAL_MINUTES * 2
+
+    def test_sync_service_failure_backs_off(self, failing: SyncScheduler) -> None:
+        """Should back off when the real background sync callback fails."""
+        from services.sync_service import SyncService
+
+        service = SyncService.__new__(SyncService)
+        service.full_sync = AsyncMock(side_effect=RuntimeError("backend down"))  # type: ignore[method-assign]
+        failing.set_full_sync_callback(service._background_full_sync)
+
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+
+        assert service.full_sync.await_count == 2
+        assert self._job_minutes(failing) == SyncScheduler.FULL_SYNC_INTERVAL_MINUTES * 2
+
+    def test_sync_service_rate_limit_is_not_a_failure(self, failing: SyncScheduler) -> None:
+        """Should not count a rate-limited background sync as a failure."""
+        from core.exceptions import RateLimitError
+        from services.sync_service import SyncService
+
+        service = SyncService.__new__(SyncService)
+        service.full_sync = AsyncMock(side_effect=RateLimitError())  # type: ignore[method-assign]
+        failing.set_full_sync_callback(service._background_full_sync)
+
+        failing._run_full_sync_wrapper()
+        failing._run_full_sync_wrapper()
+
+        assert failing._consecutive_failures == 0
+        assert self._job_minutes(failing) == SyncScheduler.IFTTT_SYNC_INTERVAL_MINUTES
+
+
+class TestLastSyncMemo:
+    """Tests for the in-memory last sync timestamp."""
+
+    @pytest.fixture(autouse=True)
+    def reset_memo(self) -> Generator[None, None, None]:
+        original = SyncScheduler._last_sync_epoch
+        SyncScheduler._last_sync_epoch = None
+        yield
+        SyncScheduler._last_sync_epoch = original
+
+    def test_recent_sync_skips_ifttt_without_loading_state(
+        self, scheduler: SyncScheduler, has_session
+    ) -> None:
+        """Should skip the IFTTT check using the memo, not the state file."""
+        calls: list[str] = []
+
+        async def callback() -> None:
+            calls.append("ran")
+
+        scheduler.set_ifttt_sync_callback(callback)
+        scheduler.start()
+        SyncScheduler.record_sync_complete()
+
+        with patch("state.StateManager") as state_manager:
+            scheduler._run_ifttt_sync_wrapper()
+
+        state_manager.assert_not_called()
+        assert calls == []
+
+    def test_stale_sync_runs_ifttt(self, scheduler: SyncScheduler, has_session) -> None:
+        """Should run the IFTTT check when the last sync is older than a tick."""
+        calls: list[str] = []
+
+        async def callback() -> None:
+            calls.append("ran")
+
+        scheduler.set_ifttt_sync_callback(callback)
+        scheduler.start()
+        SyncScheduler._last_sync_epoch = time.time() - 3600
+
+        scheduler._run_ifttt_sync_wrapper()
+
+        assert calls == ["ran"]
+
+    def test_failed_full_sync_leaves_memo_alone(
+        self, scheduler: SyncScheduler, has_session
+    ) -> None:
+        """Should only move the memo when the sync itself marks completion."""
+
+        async def callback() -> bool:
+            return False
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.start()
+
+        scheduler._run_full_sync_wrapper()
+
+        assert SyncScheduler._last_sync_epoch is None
+
+    def test_loads_state_once_when_unknown(self, scheduler: SyncScheduler) -> None:
+        """Should read last_sync from state on first use and cache it."""
+        with patch("state.StateManager") as state_manager:
+            state_manager.return_value.get_last_sync_epoch.return_value = 1735689600.0
+
+            first = scheduler._get_last_sync_epoch()
+            second = scheduler._get_last_sync_epoch()
+
+        assert first == second == 1735689600.0
+        state_manager.assert_called_once()
+
+
+class TestSessionGuard:
+    """Tests for skipping jobs without an active session."""
+
+    def test_skips_without_session(self, scheduler: SyncScheduler) -> None:
+        """Should not run the callback when no session credentials exist."""
+        calls: list[str] = []
+
+        async def callback() -> None:
+            calls.append("ran")
+
+        scheduler.set_full_sync_callback(callback)
+        scheduler.start()
+
+        with patch.object(SyncScheduler, "_has_session_credentials", return_value=False):
+            scheduler._run_full_sync_wrapper()
+
+        assert calls == []
+
+    def test_session_check_reads_live_credentials(self, scheduler: SyncScheduler) -> None:
+        """Should reflect credential changes after the class is cached."""
+        from services.credentials_service import CredentialsService
+
+        with patch.object(CredentialsService, "_session_credentials", None):
+            assert not scheduler._has_session_credentials()
+        with patch.object(CredentialsService, "_session_credentials", {"email": "a@b.c"}):
+            assert scheduler._has_session_credentials()
@@ -6,16 +6,31 @@ Tests cover:
 - Event filtering and pagination
 - Summary statistics
 - CSV export
-- Geolocation caching
+- Geolocation caching and background lookup
 - Event cleanup
+- IP lockouts
 """
 
+import dataclasses
+import http.client
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
-from services.security_service import SecurityEvent, SecurityEventSummary, SecurityService
+from services.security_service import (
+    CLEANUP_INTERVAL_SECONDS,
+    CONNECTION_POOL_SIZE,
+    LOCKOUT_THRESHOLD,
+    SecurityEvent,
+    SecurityEventSummary,
+    SecurityService,
+    _is_obviously_local_ip,
+)
 
 
 @pytest.fixture
@@ -34,11 +49,85 @@ def security_service(tmp_path: Path):
         service = SecurityService()
         yield service
 
+        if service._cleanup_timer is not None:
+            service._cleanup_timer.cancel()
+
         # Cleanup singleton after test
         SecurityService._instance = None
         SecurityService._initialized = False
 
 
+class TestConnection:
+    """Tests for database connection setup."""
+
+    def test_uses_wal_journal(self, security_service: SecurityService) -> None:
+        """Should open the database in WAL mode with relaxed syncing."""
+        with security_service._connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+    def test_connections_shared_across_threads(self, security_service: SecurityService) -> None:
+        """Should hand a returned connection to the next thread instead of opening another."""
+        with security_service._connection() as main_conn:
+            pass
+        other: list = []
+
+        def borrow() -> None:
+            with security_service._connection() as conn:
+                other.append(conn)
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        thread.join()
+
+        assert other[0] is main_conn
+        assert security_service._pool_size == 1
+
+    def test_pool_is_bounded(self, security_service: SecurityService) -> None:
+        """Should never open more than the pool size, even with more threads waiting."""
+        barrier = threading.Barrier(CONNECTION_POOL_SIZE)
+        borrowed: list = []
+
+        def borrow() -> None:
+            with security_service._connection() as conn:
+                borrowed.append(conn)
+                if len(borrowed) <= CONNECTION_POOL_SIZE:
+                    barrier.wait(timeout=5)
+
+        threads = [threading.Thread(target=borrow) for _ in range(CONNECTION_POOL_SIZE * 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(borrowed) == CONNECTION_POOL_SIZE * 2
+        assert security_service._pool_size == CONNECTION_POOL_SIZE
+
+    def test_writes_visible_across_threads(self, security_service: SecurityService) -> None:
+        """Should let other threads read events committed on another connection."""
+        thread = threading.Thread(
+            target=lambda: security_service.log_event(event_type="LOGOUT", success=True)
+        )
+        thread.start()
+        thread.join()
+
+        _, total = security_service.get_events()
+        assert total == 1
+
+    def test_filtered_lookups_use_composite_index(self, security_service: SecurityService) -> None:
+        """Should answer type/success filters ordered by time from one index."""
+        with security_service._connection() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM security_events "
+                "WHERE event_type = 'LOGIN_ATTEMPT' AND success = 0 "
+                "ORDER BY timestamp DESC LIMIT 10"
+            ).fetchall()
+        details = " ".join(row["detail"] for row in plan)
+
+        assert "idx_security_events_type_success_ts" in details
+        assert "TEMP B-TREE" not in details
+
+
 class TestSecurityEventLogging:
     """Tests for event logging functionality."""
 
@@ -96,6 +185,31 @@ class TestSecurityEventLogging:
         events, _ = security_service.get_events(limit=10)
         assert len(events[0].user_agent) == 256
 
+    def test_failed_insert_leaves_no_open_transaction(
+        self, security_service: SecurityService
+    ) -> None:
+        """Should roll back a failed write instead of leaving it pending."""
+        security_service.log_event(event_type=None, success=True)
+
+        with security_service._connection() as conn:
+            assert not conn.in_transaction
+        _, total = security_service.get_events()
+        assert total == 0
+
+    def test_successful_login_records_last_login(self, security_service: SecurityService) -> None:
+        """Should store the login time alongside the event in one commit."""
+        with security_service._connection() as conn:
+            pass
+        statements: list[str] = []
+        conn.set_trace_callback(statements.append)
+
+        security_service.log_event(event_type="REMOTE_UNLOCK", success=True)
+
+        conn.set_trace_callback(None)
+        assert statements.count("COMMIT") == 1
+        events, _ = security_service.get_events()
+        assert security_service._get_preference("last_login_timestamp") == events[0].timestamp
+
     def test_log_multiple_events(self, security_service: SecurityService) -> None:
         """Should log multiple events."""
         for i in range(5):
@@ -137,6 +251,16 @@ class TestEventRetrieval:
         offset_ids = {e.id for e in offset_events}
         assert all_ids.isdisjoint(offset_ids)
 
+    def test_get_events_offset_past_end(self, security_service: SecurityService) -> None:
+        """Should still report the filtered total when the page is empty."""
+        for _ in range(3):
+            security_service.log_event(event_type="TEST", success=True)
+
+        events, total = security_service.get_events(limit=10, offset=10)
+
+        assert events == []
+        assert total == 3
+
     def test_get_events_filter_by_type(self, security_service: SecurityService) -> None:
         """Should filter events by type."""
         security_service.log_event(event_type="LOGIN_ATTEMPT", success=True)
@@ -247,6 +371,56 @@ class TestSummaryStatistics:
         assert summary.last_successful_login is not None
         assert summary.last_failed_login is not None
 
+    def test_get_summary_last_login_is_latest(self, security_service: SecurityService) -> None:
+        """Should report the most recent timestamp for each login outcome."""
+        for _ in range(3):
+            security_service.log_event(event_type="LOGIN_ATTEMPT", success=True)
+        security_service.log_event(event_type="LOGOUT", success=True)
+
+        events, _ = security_service.get_events(event_types=["LOGIN_ATTEMPT"])
+        summary = security_service.get_summary()
+
+        assert summary.last_successful_login == events[0].timestamp
+        assert summary.last_failed_login is None
+
+
+class TestSummaryCache:
+    """Tests for memoizing the summary between writes."""
+
+    def test_repeat_reads_are_cached(self, security_service: SecurityService) -> None:
+        """Should not query the database again within the TTL."""
+        first = security_service.get_summary()
+
+        with patch.object(security_service, "_connection") as connection:
+            second = security_service.get_summary()
+
+        connection.assert_not_called()
+        assert second is first
+
+    def test_log_event_invalidates(self, security_service: SecurityService) -> None:
+        """Should recompute after a new event is logged."""
+        assert security_service.get_summary().total_events == 0
+
+        security_service.log_event(event_type="LOGOUT", success=True)
+
+        assert security_service.get_summary().total_events == 1
+
+    def test_clear_events_invalidates(self, security_service: SecurityService) -> None:
+        """Should recompute after events are cleared."""
+        security_service.log_event(event_type="LOGOUT", success=True)
+        assert security_service.get_summary().total_events == 1
+
+        security_service.clear_events()
+
+        assert security_service.get_summary().total_events == 0
+
+    def test_expires_after_ttl(self, security_service: SecurityService) -> None:
+        """Should recompute once the TTL has elapsed."""
+        first = security_service.get_summary()
+
+        with patch.object(SecurityService, "SUMMARY_CACHE_TTL_SECONDS", 0):
+            assert security_service.get_summary() is not first
+
 
 class TestCSVExport:
     """Tests for CSV export functionality."""
@@ -289,6 +463,16 @@ class TestCSVExport:
         # Should be escaped/prefixed
         assert "=HYPERLINK" not in csv_content or "'=HYPERLINK" in csv_content
 
+    def test_export_csv_newest_first(self, security_service: SecurityService) -> None:
+        """Should list rows newest first with Yes/No success values."""
+        security_service.log_event(event_type="FIRST", success=False)
+        security_service.log_event(event_type="SECOND", success=True)
+
+        lines = security_service.export_events_csv().strip().splitlines()
+
+        assert lines[1].split(",")[1:3] == ["SECOND", "Yes"]
+        assert lines[2].split(",")[1:3] == ["FIRST", "No"]
+
 
 class TestGeolocation:
     """Tests for IP geolocation functionality."""
@@ -306,6 +490,30 @@ class TestGeolocation:
         assert country is None
         assert city is None
 
+    def test_skip_local_ranges_without_parsing(self, security_service: SecurityService) -> None:
+        """Should recognize common local addresses before parsing them."""
+        local = ["10.0.0.1", "172.16.0.1", "172.31.255.255", "169.254.1.1", "::1", "fd00::1"]
+
+        with patch("services.security_service.ipaddress.ip_address") as parse:
+            for ip in local:
+                assert security_service._get_geolocation(ip) == (None, None)
+
+        parse.assert_not_called()
+
+    def test_fast_path_leaves_public_172_addresses(self) -> None:
+        """Should only treat 172.16.0.0/12 as local."""
+        assert _is_obviously_local_ip("172.20.1.1")
+        assert not _is_obviously_local_ip("172.32.0.1")
+        assert not _is_obviously_local_ip("172.15.0.1")
+        assert not _is_obviously_local_ip("100.64.0.1")
+
+    def test_log_event_skips_lookup_for_local_ip(self, security_service: SecurityService) -> None:
+        """Should not queue a lookup for local addresses."""
+        security_service.log_event(event_type="LOGIN_ATTEMPT", success=True, ip_address="10.0.0.5")
+
+        assert security_service._geo_pending == {}
+        assert security_service._geo_thread is None
+
     def test_skip_invalid_ip(self, security_service: SecurityService) -> None:
         """Should skip geolocation for invalid IPs."""
         country, city = security_service._get_geolocation("not-an-ip")
@@ -329,6 +537,126 @@ class TestGeolocation:
         assert cached[0] == "United States"
         assert cached[1] == "Mountain View"
 
+    def test_memory_cache_skips_database(self, security_service: SecurityService) -> None:
+        """Should answer repeat lookups without querying SQLite."""
+        security_service._cache_geolocation("8.8.8.8", "United States", "Mountain View")
+
+        with patch.object(security_service, "_connection") as connection:
+            cached = security_service._get_cached_geolocation("8.8.8.8")
+
+        connection.assert_not_called()
+        assert cached == ("United States", "Mountain View")
+
+    def test_memory_cache_loads_from_database(self, security_service: SecurityService) -> None:
+        """Should fall back to the database table and remember the result."""
+        security_service._cache_geolocation("8.8.8.8", "United States", "Mountain View")
+        security_service._geo_memory.clear()
+
+        assert security_service._get_cached_geolocation("8.8.8.8") == (
+            "United States",
+            "Mountain View",
+        )
+        assert "8.8.8.8" in security_service._geo_memory
+
+    def test_memory_cache_is_bounded(self, security_service: SecurityService) -> None:
+        """Should evict the least recently used IP beyond the size limit."""
+        with patch("services.security_service.GEOLOCATION_MEMORY_CACHE_SIZE", 2):
+            security_service._cache_geolocation("1.1.1.1", "A", None)
+            security_service._cache_geolocation("2.2.2.2", "B", None)
+            security_service._get_cached_geolocation("1.1.1.1")
+            security_service._cache_geolocation("3.3.3.3", "C", None)
+
+        assert list(security_service._geo_memory) == ["1.1.1.1", "3.3.3.3"]
+
+    def test_reuses_http_connection(self, security_service: SecurityService) -> None:
+        """Should send repeat lookups over one keep-alive connection."""
+        with patch("services.security_service.http.client.HTTPConnection") as connection_cls:
+            connection = connection_cls.return_value
+            connection.getresponse.return_value.status = 200
+            connection.getresponse.return_value.read.side_effect = [
+                b'{"status": "success", "country": "United States", "city": "Ashburn"}',
+                b'{"status": "success", "country": "Germany", "city": "Berlin"}',
+            ]
+
+            assert security_service._get_geolocation("3.3.3.3") == ("United States", "Ashburn")
+            assert security_service._get_geolocation("4.4.4.4") == ("Germany", "Berlin")
+
+        connection_cls.assert_called_once()
+        assert connection.request.call_count == 2
+
+    def test_retries_once_on_dropped_connection(self, security_service: SecurityService) -> None:
+        """Should reconnect when the server closed the idle connection."""
+        with patch("services.security_service.http.client.HTTPConnection") as connection_cls:
+            connection = connection_cls.return_value
+            connection.request.side_effect = [http.client.RemoteDisconnected("closed"), None]
+            connection.getresponse.return_value.status = 200
+            connection.getresponse.return_value.read.return_value = (
+                b'{"status": "success", "country": "France", "city": "Paris"}'
+            )
+
+            assert security_service._get_geolocation("5.5.5.5") == ("France", "Paris")
+
+        connection.close.assert_called_once()
+
+    def test_ignores_non_200_response(self, security_service: SecurityService) -> None:
+        """Should drain and discard an error page without caching it."""
+        with patch("services.security_service.http.client.HTTPConnection") as connection_cls:
+            response = connection_cls.return_value.getresponse.return_value
+            response.status = 503
+            response.read.return_value = b"<html>Service Unavailable</html>"
+
+            assert security_service._get_geolocation("6.6.6.6") == (None, None)
+
+        response.read.assert_called_once()
+        assert "6.6.6.6" not in security_service._geo_memory
+
+
+class TestBackgroundGeolocation:
+    """Tests for resolving event geolocation off the request thread."""
+
+    def test_log_event_does_not_wait_for_lookup(self, security_service: SecurityService) -> None:
+        """Should insert the event before the lookup runs and fill it in afterwards."""
+        release = threading.Event()
+
+        def slow_lookup(ip_address: str) -> tuple[str | None, str | None]:
+            release.wait(timeout=5)
+            return "United States", "Mountain View"
+
+        with patch.object(security_service, "_get_geolocation", side_effect=slow_lookup):
+            security_service.log_event(
+                event_type="LOGIN_ATTEMPT", success=True, ip_address="8.8.8.8"
+            )
+
+            events, _ = security_service.get_events(limit=10)
+            assert events[0].country is None
+
+            release.set()
+            security_service._geo_q.join()
+
+        events, _ = security_service.get_events(limit=10)
+        assert events[0].country == "United States"
+        assert events[0].city == "Mountain View"
+
+    def test_deduplicates_inflight_lookups(self, security_service: SecurityService) -> None:
+        """Should look up a repeated IP once and update every pending event."""
+        release = threading.Event()
+
+        def slow_lookup(ip_address: str) -> tuple[str | None, str | None]:
+            release.wait(timeout=5)
+            return "Germany", "Berlin"
+
+        with patch.object(security_service, "_get_geolocation", side_effect=slow_lookup) as lookup:
+            for _ in range(5):
+                security_service.log_event(
+                    event_type="LOGIN_ATTEMPT", success=False, ip_address="1.2.3.4"
+                )
+            release.set()
+            security_service._geo_q.join()
+
+        lookup.assert_called_once_with("1.2.3.4")
+        events, _ = security_service.get_events(limit=10)
+        assert [event.city for event in events] == ["Berlin"] * 5
+
 
 class TestClearEvents:
     """Tests for clearing events."""
@@ -353,6 +681,44 @@ class TestClearEvents:
         assert total == 0
 
 
+class TestRetentionCleanup:
+    """Tests for deleting events past the retention period."""
+
+    def _insert_event(self, service: SecurityService, timestamp: str) -> None:
+        with service._connection() as conn, conn:
+            conn.execute(
+                "INSERT INTO security_events (event_type, success, timestamp) VALUES (?, ?, ?)",
+                ("TEST", 1, timestamp),
+            )
+
+    def test_cleanup_runs_off_init(self, security_service: SecurityService) -> None:
+        """Should schedule cleanup on a daemon timer instead of running it inline."""
+        timer = security_service._cleanup_timer
+
+        assert timer is not None
+        assert timer.daemon
+
+    def test_deletes_expired_events_in_batches(self, security_service: SecurityService) -> None:
+        """Should delete every expired event across several batches."""
+        for _ in range(5):
+            self._insert_event(security_service, "2000-01-01T00:00:00+00:00")
+        security_service.log_event(event_type="RECENT", success=True)
+
+        with patch("services.security_service.CLEANUP_BATCH_SIZE", 2):
+            security_service._cleanup_old_events()
+
+        events, total = security_service.get_events()
+        assert total == 1
+        assert events[0].event_type == "RECENT"
+
+    def test_scheduled_run_reschedules(self, security_service: SecurityService) -> None:
+        """Should queue the next daily run after each cleanup."""
+        with patch.object(security_service, "_schedule_cleanup") as schedule:
+            security_service._run_scheduled_cleanup()
+
+        schedule.assert_called_once_with(CLEANUP_INTERVAL_SECONDS)
+
+
 class TestFailedSinceLastLogin:
     """Tests for getting failed attempts since last login."""
 
@@ -391,6 +757,118 @@ class TestFailedSinceLastLogin:
         assert len(events_after) == 0
 
 
+class TestPreferenceCache:
+    """Tests for keeping security preferences in memory."""
+
+    def test_repeat_reads_skip_database(self, security_service: SecurityService) -> None:
+        """Should read each preference from SQLite once, including missing ones."""
+        security_service._set_preference("alert_dismissed_at", "2026-01-01T00:00:00+00:00")
+        security_service._preference_cache.clear()
+
+        security_service._get_preference("alert_dismissed_at")
+        security_service._get_preference("last_login_timestamp")
+        with patch.object(security_service, "_connection") as connection:
+            dismissed = security_service._get_preference("alert_dismissed_at")
+            last_login = security_service._get_preference("last_login_timestamp")
+
+        connection.assert_not_called()
+        assert dismissed == "2026-01-01T00:00:00+00:00"
+        assert last_login is None
+
+    def test_writes_update_cache(self, security_service: SecurityService) -> None:
+        """Should return values written by _set_preference and successful logins."""
+        assert security_service._get_preference("last_login_timestamp") is None
+
+        security_service.log_event(event_type="LOGIN_ATTEMPT", success=True)
+        events, _ = security_service.get_events()
+
+        assert security_service._get_preference("last_login_timestamp") == events[0].timestamp
+
+    def test_rolled_back_login_leaves_cache(self, security_service: SecurityService) -> None:
+        """Should not cache a login time whose transaction was rolled back."""
+        assert security_service._get_preference("last_login_timestamp") is None
+
+        borrow = security_service._connection
+
+        class FailingCommit:
+            """Connection proxy whose transaction fails at COMMIT, as on SQLITE_BUSY."""
+
+            def __init__(self, conn: sqlite3.Connection) -> None:
+                self._conn = conn
+
+            def __getattr__(self, name: str):
+                return getattr(self._conn, name)
+
+            def __enter__(self) -> "FailingCommit":
+                return self
+
+            def __exit__(self, *exc_info) -> None:
+                self._conn.rollback()
+                raise sqlite3.OperationalError("database is locked")
+
+        @contextmanager
+        def failing_connection():
+            with borrow() as conn:
+                yield FailingCommit(conn)
+
+        with patch.object(security_service, "_connection", failing_connection):
+            security_service.log_event(event_type="LOGIN_ATTEMPT", success=True)
+
+        assert security_service._get_preference("last_login_timestamp") is None
+        assert security_service.get_events()[1] == 0
+
+
+class TestIpLockout:
+    """Tests for remote unlock brute-force lockouts."""
+
+    def test_not_locked_below_threshold(self, security_service: SecurityService) -> None:
+        """Should count failures without locking before the threshold."""
+        for _ in range(LOCKOUT_THRESHOLD - 1):
+            assert not security_service.record_failed_remote_unlock("8.8.8.8")
+
+        assert not security_service.is_ip_locked_out("8.8.8.8")
+        assert security_service.get_lockout_remaining_seconds("8.8.8.8") == 0
+
+    def test_locks_at_threshold(self, security_service: SecurityService) -> None:
+        """Should lock the IP once the threshold is reached."""
+        for _ in range(LOCKOUT_THRESHOLD - 1):
+            security_service.record_failed_remote_unlock("8.8.8.8")
+
+        assert security_service.record_failed_remote_unlock("8.8.8.8")
+        assert security_service.is_ip_locked_out("8.8.8.8")
+        assert security_service.get_lockout_remaining_seconds("8.8.8.8") > 0
+        assert not security_service.is_ip_locked_out("8.8.4.4")
+
+    def test_expired_lockout_is_cleared(self, security_service: SecurityService) -> None:
+        """Should release and forget an IP once its lockout has passed."""
+        for _ in range(LOCKOUT_THRESHOLD):
+            security_service.record_failed_remote_unlock("8.8.8.8")
+        with security_service._connection() as conn, conn:
+            conn.execute(
+                "UPDATE ip_lockouts SET locked_until = ?",
+                ((datetime.now(UTC) - timedelta(seconds=1)).isoformat(),),
+            )
+
+        assert not security_service.is_ip_locked_out("8.8.8.8")
+        with security_service._connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ip_lockouts").fetchone()[0] == 0
+
+    def test_clear_resets_counter(self, security_service: SecurityService) -> None:
+        """Should start counting from zero after a successful unlock."""
+        for _ in range(LOCKOUT_THRESHOLD):
+            security_service.record_failed_remote_unlock("8.8.8.8")
+
+        security_service.clear_ip_lockout("8.8.8.8")
+
+        assert not security_service.is_ip_locked_out("8.8.8.8")
+        assert not security_service.record_failed_remote_unlock("8.8.8.8")
+
+    def test_ignores_missing_ip(self, security_service: SecurityService) -> None:
+        """Should never lock out requests without a client IP."""
+        assert not security_service.record_failed_remote_unlock(None)
+        assert not security_service.is_ip_locked_out(None)
+
+
 class TestSecurityEventDataclass:
     """Tests for SecurityEvent dataclass."""
 
@@ -429,6 +907,14 @@ class TestSecurityEventDataclass:
         assert event.details is None
         assert event.user_agent is None
 
+    def test_security_event_is_immutable(self) -> None:
+        """Should use slots and reject attribute changes."""
+        event = SecurityEvent(id=1, event_type="TEST", success=True, timestamp="now")
+
+        assert not hasattr(event, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            event.success = False  # type: ignore[misc]
+
 
 class TestSecurityEventSummaryDataclass:
     """Tests for SecurityEventSummary dataclass."""
@@ -352,6 +352,26 @@ class TestRefundsExportImport:
         assert result.success
         assert result.imported["refunds"] is True
 
+    def test_import_refunds_skips_duplicate_matches(self, state_manager: StateManager) -> None:
+        """Import should keep one match per original transaction and warn on the rest."""
+        match = {"original_transaction_id": "txn-100", "skipped": True}
+        export_data = {
+            "eclosion_export": {
+                "version": "1.2",
+                "exported_at": "2026-01-03T12:00:00Z",
+                "source_mode": "production",
+            },
+            "tools": {"refunds": {"config": {}, "views": [], "matches": [match, dict(match)]}},
+            "app_settings": {},
+        }
+
+        service = SettingsExportService(state_manager)
+        result = service.import_settings(export_data, tools=["refunds"])
+
+        assert result.success
+        assert any("txn-100" in warning for warning in result.warnings)
+        assert len(service.export_settings().data["tools"]["refunds"]["matches"]) == 1
+
     def test_import_v1_0_without_refunds(self, state_manager: StateManager) -> None:
         """Importing v1.0 export (no refunds) should succeed."""
         export_data = {
@@ -36,6 +36,19 @@ class TestStateManagerBasics:
         assert loaded.target_group_name == "Test Group"
         assert loaded.is_configured()
 
+    def test_last_sync_epoch_matches_loaded_state(self, state_manager: StateManager) -> None:
+        """get_last_sync_epoch should match last_sync from a full load."""
+        from datetime import datetime
+
+        assert state_manager.get_last_sync_epoch() is None
+
+        state_manager.mark_sync_complete()
+        loaded = state_manager.load()
+        assert loaded.last_sync is not None
+        expected = datetime.fromisoformat(loaded.last_sync.replace("Z", "+00:00")).timestamp()
+
+        assert state_manager.get_last_sync_epoch() == expected
+
 
 class TestTrackerStateConfiguration:
     """Configuration-related operations."""
@@ -214,3 +227,24 @@ class TestFrozenTargetPersistence:
         result = state_manager.get_frozen_target("recurring-001")
         assert result is not None
         assert result["frozen_monthly_target"] == 16.0
+
+    def test_clear_frozen_targets_clears_only_given_items(
+        self, state_manager: StateManager
+    ) -> None:
+        """clear_frozen_targets should clear every listed item and no others."""
+        for key in ("rollup_a", "rollup_b", "rollup_c"):
+            state_manager.set_frozen_target(
+                recurring_id=key,
+                frozen_target=5.0,
+                target_month="2026-01",
+                balance_at_start=0.0,
+                amount=60.0,
+                frequency_months=12.0,
+            )
+
+        cleared = state_manager.clear_frozen_targets(["rollup_a", "rollup_b", "rollup_missing"])
+
+        assert cleared == 2
+        assert state_manager.get_frozen_target("rollup_a") is None
+        assert state_manager.get_frozen_target("rollup_b") is None
+        assert state_manager.get_frozen_target("rollup_c") is not None